@@ -1,5 +1,6 @@
 /*
- This file is only used for testing purpose and have no impact on actual production.
+ This file is only used for testing purpose and have no impact on actual production,
+ except for its jsModules list, which scripts/build_res.py builds the production bundle from.
  The equivalent to this file on production is Special:RLA, and should be kept in sync with it.
 */
 
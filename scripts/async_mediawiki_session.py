@@ -0,0 +1,94 @@
+import asyncio
+import contextlib
+import pathlib
+
+from typing import Any, AsyncIterator, Callable, Iterable, Optional, TypeVar
+
+from mediawiki_session import MediaWikiSession
+from rate_limiter import TokenBucket
+
+__all__ = [
+    "AsyncMediaWikiSession",
+]
+
+PER_WIKI_CONCURRENCY = 1
+
+T = TypeVar("T")
+
+
+class AsyncMediaWikiSession(contextlib.AbstractAsyncContextManager):
+    """asyncio variant of MediaWikiSession with the same API surface.
+
+    Calls run the blocking session on worker threads, so pacing, retries,
+    cookies and the connection pool are shared with synchronous sessions.
+    At most `wiki_limit` calls of this session are in flight at once, and
+    `global_limit` can be shared between sessions to bound the calls in
+    flight across all wikis.
+    """
+
+    __global_limit: Optional[asyncio.Semaphore]
+    __session: MediaWikiSession
+    __wiki_limit: asyncio.Semaphore
+
+    def __init__(
+        self,
+        wiki: str,
+        budget: Optional[TokenBucket] = None,
+        global_limit: Optional[asyncio.Semaphore] = None,
+        wiki_limit: int = PER_WIKI_CONCURRENCY,
+    ):
+        self.__global_limit = global_limit
+        self.__session = MediaWikiSession(wiki, budget)
+        self.__wiki_limit = asyncio.Semaphore(wiki_limit)
+
+    async def __run(self, function: Callable[..., T], *args, **kwargs) -> T:
+        async with self.__wiki_limit, self.__global_limit or contextlib.nullcontext():
+            return await asyncio.to_thread(function, *args, **kwargs)
+
+    @property
+    def wiki(self) -> str:
+        return self.__session.wiki
+
+    @property
+    async def token(self) -> str:
+        return await self.__run(getattr, self.__session, "token")
+
+    async def make_action(
+        self, action: str, params: Optional[dict] = None, data: Optional[dict] = None
+    ) -> dict[str, Any]:
+        return await self.__run(self.__session.make_action, action, params, data)
+
+    async def paginate_query(self, data: dict) -> AsyncIterator[dict[str, Any]]:
+        results = self.__session.paginate_query(data)
+        while (result := await self.__run(next, results, None)) is not None:
+            yield result
+
+    async def get_missing_pages(self, titles: Iterable[str]) -> set[str]:
+        return await self.__run(self.__session.get_missing_pages, list(titles))
+
+    async def get_page_sha1s(self, titles: Iterable[str]) -> dict[str, Optional[str]]:
+        return await self.__run(self.__session.get_page_sha1s, list(titles))
+
+    async def deploy_file(
+        self,
+        file_path: pathlib.Path,
+        file_content: str,
+        target_page: str,
+        deploy_reason: str,
+    ) -> tuple[bool, bool]:
+        return await self.__run(
+            self.__session.deploy_file,
+            file_path,
+            file_content,
+            target_page,
+            deploy_reason,
+        )
+
+    async def close(self):
+        await asyncio.to_thread(self.__session.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import pathlib
+import re
+import subprocess
+
+import rjsmin
+
+from typing import Any
+
+__all__ = [
+    "BUNDLE_DIR",
+    "MANIFEST_FILE",
+    "build_bundles",
+    "bundle_version",
+]
+
+JAVASCRIPT_DIR = pathlib.Path("./javascript/")
+STYLESHEETS_DIR = pathlib.Path("./stylesheets/")
+BUNDLE_DIR = pathlib.Path("./lua/output/bundle/")
+MANIFEST_FILE = BUNDLE_DIR / "manifest.json"
+HASH_LENGTH = 12
+
+# Main.js and Main.scss mirror the load order of Special:ResourceLoaderArticles,
+# so their module lists are what the bundles are built from
+JS_MODULES_PATTERN = re.compile(r"const jsModules = (\[[\s\S]*?\]);")
+SCSS_USE_PATTERN = re.compile(r"^@use \"(?P<module>[^\"]+)\";$", re.MULTILINE)
+
+
+def check_sources(res_type: str, commons_dir: pathlib.Path, sources: list[str]):
+    """Fail on listed modules that do not exist, and warn about deployed
+    commons files that the bundle leaves out."""
+    listed = set(sources)
+    missing = sorted(source for source in listed if not pathlib.Path(source).exists())
+    if len(missing) > 0:
+        raise FileNotFoundError(
+            f"{res_type} bundle lists missing files: {', '.join(missing)}"
+        )
+    for file_path in sorted(
+        commons_dir.rglob(f"*.{'js' if res_type == 'js' else 'scss'}")
+    ):
+        if file_path.as_posix() not in listed:
+            print(
+                f"::warning file={file_path.as_posix()}::not in the {res_type} bundle"
+            )
+
+
+def js_modules() -> list[str]:
+    """Names of the commons JS modules listed in Main.js, in load order."""
+    main_js = (JAVASCRIPT_DIR / "Main.js").read_text()
+    modules_match = JS_MODULES_PATTERN.search(main_js)
+    if modules_match is None:
+        raise ValueError("Could not find jsModules array in Main.js")
+    return json.loads(modules_match.group(1).replace("'", '"'))
+
+
+def build_js() -> tuple[str, list[str]]:
+    """Concatenate and minify the modules, like build-js.js without the
+    local-only additions. Returns the bundle and its source files."""
+    sources = [
+        (JAVASCRIPT_DIR / "commons" / f"{module}.js").as_posix()
+        for module in js_modules()
+    ]
+    check_sources("js", JAVASCRIPT_DIR / "commons", sources)
+    bundle = "".join(pathlib.Path(source).read_text() + "\n;\n" for source in sources)
+    return rjsmin.jsmin(bundle, keep_bang_comments=True), sources
+
+
+def build_css() -> tuple[str, list[str]]:
+    """Compile Main.scss to compressed CSS with sass from node_modules.
+    Returns the bundle and its source files."""
+    main_scss = STYLESHEETS_DIR / "Main.scss"
+    sources = [
+        (STYLESHEETS_DIR / f"{match.group('module')}.scss").as_posix()
+        for match in SCSS_USE_PATTERN.finditer(main_scss.read_text())
+    ]
+    check_sources("css", STYLESHEETS_DIR / "commons", sources)
+    bundle = subprocess.check_output(
+        [
+            "npx",
+            "--no-install",
+            "sass",
+            "--style=compressed",
+            "--no-source-map",
+            str(main_scss),
+        ]
+    ).decode()
+    return bundle, sources
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:HASH_LENGTH]
+
+
+def bundle_version(manifest: dict[str, Any]) -> str:
+    """Version key covering the content of every bundle in the manifest."""
+    return content_hash("".join(bundle["hash"] for bundle in manifest.values()))
+
+
+def build_bundles() -> dict[str, Any]:
+    """Write the JS and CSS bundles and their manifest to BUNDLE_DIR, and
+    return the manifest.
+
+    Each bundle deploys to the same page every time, so deploys replace it
+    rather than pile up pages. Browsers tell versions apart by the resource
+    cache version, which deploy_res.py sets from bundle_version().
+    """
+    BUNDLE_DIR.mkdir(parents=True, exist_ok=True)
+    manifest: dict[str, Any] = dict()
+    for res_type, build in (("js", build_js), ("css", build_css)):
+        bundle, sources = build()
+        file_name = f"main.{res_type}"
+        (BUNDLE_DIR / file_name).write_text(bundle)
+        manifest[res_type] = {
+            "file": file_name,
+            "page": f"MediaWiki:Common.{res_type}/bundle/{file_name}",
+            "hash": content_hash(bundle),
+            "size": len(bundle.encode("utf-8")),
+            "sources": sources,
+        }
+    with MANIFEST_FILE.open("w") as manifest_file:
+        json.dump(manifest, manifest_file, indent="\t")
+    return manifest
+
+
+def main():
+    manifest = build_bundles()
+    for res_type, bundle in manifest.items():
+        print(
+            f"{res_type}: {len(bundle['sources'])} files -> "
+            f"{str(BUNDLE_DIR / bundle['file'])} ({bundle['size']} bytes)"
+        )
+
+
+if __name__ == "__main__":
+    main()
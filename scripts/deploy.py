@@ -2,7 +2,6 @@ import argparse
 import itertools
 import os
 import pathlib
-import re
 import subprocess
 import sys
 
@@ -11,18 +10,19 @@ from typing import Iterable, Optional
 from dotenv import load_dotenv
 
 from deploy_util import (
+    content_sha1,
     get_git_deploy_reason,
     read_file_from_path,
+    run_concurrently,
     write_to_github_summary_file,
 )
-from mediawiki_session import MediaWikiSession
+from header_index import HeaderIndex
+from mediawiki_session import MediaWikiSession, MediaWikiSessionError
+from rate_limiter import TokenBucket
 
 load_dotenv()
 
 INVALID_DEV_ENV_NAMES = {"/dev", "/dev/"}
-HEADER_PATTERN = re.compile(
-    r"\A---\n" r"-- @Liquipedia\n" r"-- page=(?P<pageName>[^\n]*)\n"
-)
 
 
 def deploy_all_files_for_wiki(
@@ -30,18 +30,46 @@ def deploy_all_files_for_wiki(
     file_paths: Iterable[pathlib.Path],
     deploy_reason: str,
     dev_environment: Optional[str],
+    header_index: HeaderIndex,
+    skip_unchanged: bool = False,
+    budget: Optional[TokenBucket] = None,
 ) -> bool:
     all_modules_deployed = True
-    with MediaWikiSession(wiki) as session:
+    with MediaWikiSession(wiki, budget) as session:
+        files_to_deploy: list[tuple[pathlib.Path, str, Optional[str]]] = list()
         for file_path in file_paths:
+            page = header_index.page(file_path)
+            if page is None:
+                files_to_deploy.append((file_path, "", None))
+                continue
+            files_to_deploy.append(
+                (
+                    file_path,
+                    read_file_from_path(file_path),
+                    page + (dev_environment or ""),
+                )
+            )
+
+        remote_sha1s: dict[str, Optional[str]] = dict()
+        if skip_unchanged:
+            try:
+                remote_sha1s = session.get_page_sha1s(
+                    page for _, _, page in files_to_deploy if page is not None
+                )
+            except MediaWikiSessionError as e:
+                print(
+                    f"::warning::Could not fetch revision SHA-1s on {wiki}, "
+                    f"deploying every file: {str(e)}"
+                )
+
+        for file_path, file_content, page in files_to_deploy:
             print(f"::group::Checking {str(file_path)}")
-            file_content = read_file_from_path(file_path)
-            header_match = HEADER_PATTERN.match(file_content)
-            if not header_match:
+            if page is None:
                 print("...skipping - no magic comment found")
                 write_to_github_summary_file(f"{str(file_path)} skipped")
+            elif remote_sha1s.get(page) == content_sha1(file_content):
+                print("...skipping - unchanged")
             else:
-                page = header_match.groupdict()["pageName"] + (dev_environment or "")
                 module_deployed, _ = session.deploy_file(
                     file_path, file_content, page, deploy_reason
                 )
@@ -68,6 +96,19 @@ def build_argument_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Whether to deploy all files to wiki",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=int(os.getenv("DEPLOY_JOBS") or 1),
+        help="Number of wikis to deploy to concurrently (default: DEPLOY_JOBS environment variable if defined, otherwise 1)",
+    )
+    parser.add_argument(
+        "--request-budget",
+        type=float,
+        default=1.0,
+        help="Maximum API requests per second across all concurrent wikis; only applies with more than one job (default: 1.0)",
+    )
     parser.add_argument(
         "lua_files", nargs="*", type=pathlib.Path, help="List of lua files to deploy"
     )
@@ -90,7 +131,10 @@ def build_argument_parser() -> argparse.ArgumentParser:
 
 
 def handle_renamed_files(
-    dev_environment: Optional[str], lua_files_from_args: list[pathlib.Path], reason: str
+    dev_environment: Optional[str],
+    lua_files_from_args: list[pathlib.Path],
+    reason: str,
+    header_index: HeaderIndex,
 ):
     if dev_environment is not None or len(lua_files_from_args) == 0:
         # Suppress move entirely for dev deploys and auto resyncs
@@ -123,12 +167,14 @@ def handle_renamed_files(
     for old_file, new_file in map(parse_renamed_output, renamed_output):
         if old_file.parts[2] != new_file.parts[2]:
             continue
+        new_wiki_page_name = header_index.page(new_file)
+        if new_wiki_page_name is None:
+            print(f"::error file={str(new_file)}::not moved - no magic comment found")
+            write_to_github_summary_file(f":x: {str(new_file)} not moved")
+            continue
         print(f"::group::Moving {str(new_file)}")
         with MediaWikiSession(old_file.parts[2]) as session:
             old_wiki_page_name = f"Module:{'/'.join(old_file.parts[3:])[:-4]}"
-            file_content = read_file_from_path(new_file)
-            header_match = HEADER_PATTERN.match(file_content)
-            new_wiki_page_name = header_match.groupdict()["pageName"]
             session.make_action(
                 "move",
                 data={
@@ -143,7 +189,7 @@ def handle_renamed_files(
 
 
 def main():
-    all_modules_deployed = True
+    all_modules_deployed: bool
     lua_files: Iterable[pathlib.Path]
     git_deploy_reason: str
 
@@ -181,12 +227,30 @@ def main():
             lua_files = parsed_args.lua_files
         git_deploy_reason = get_git_deploy_reason()
 
-    handle_renamed_files(dev_environment, parsed_args.lua_files, git_deploy_reason)
-
-    for wiki, files in itertools.groupby(sorted(lua_files), lambda path: path.parts[2]):
-        all_modules_deployed &= deploy_all_files_for_wiki(
-            wiki, list(files), git_deploy_reason, dev_environment
+    budget = TokenBucket(parsed_args.request_budget) if parsed_args.jobs > 1 else None
+    with HeaderIndex() as header_index:
+        handle_renamed_files(
+            dev_environment, parsed_args.lua_files, git_deploy_reason, header_index
+        )
+        wiki_results = run_concurrently(
+            deploy_all_files_for_wiki,
+            [
+                (
+                    wiki,
+                    list(files),
+                    git_deploy_reason,
+                    dev_environment,
+                    header_index,
+                    parsed_args.deploy_all,
+                    budget,
+                )
+                for wiki, files in itertools.groupby(
+                    sorted(lua_files), lambda path: path.parts[2]
+                )
+            ],
+            parsed_args.jobs,
         )
+    all_modules_deployed = all(wiki_results)
 
     if not all_modules_deployed:
         print("::warning::Some modules were not deployed!")
@@ -1,49 +1,113 @@
-import itertools
+import argparse
 import pathlib
-import sys
 import subprocess
 
 from typing import Iterable
 
 from deploy_util import (
+    content_sha1,
     get_git_deploy_reason,
     read_file_from_path,
 )
 from mediawiki_session import MediaWikiSession
 
+BUNDLE_MANIFEST_PAGE = "MediaWiki:Common.bundle.json"
+
+# (file, content, target page)
+Resource = tuple[pathlib.Path, str, str]
+
+
+def resource_page(file_path: pathlib.Path) -> str:
+    return (
+        f"MediaWiki:Common.{'js' if file_path.suffix == '.js' else 'css'}/"
+        + "/".join(file_path.parts[2:])
+    )
+
+
+def deploy_resource(
+    session: MediaWikiSession,
+    file_path: pathlib.Path,
+    file_content: str,
+    page: str,
+    deploy_reason: str,
+) -> tuple[bool, bool]:
+    print(f"::group::Deploying {str(file_path)}")
+    print(f"...page = {page}")
+    deploy_result = session.deploy_file(file_path, file_content, page, deploy_reason)
+    print("::endgroup::")
+    return deploy_result
+
+
+def source_resources(file_paths: Iterable[pathlib.Path]) -> list[Resource]:
+    return [
+        (file_path, read_file_from_path(file_path), resource_page(file_path))
+        for file_path in file_paths
+    ]
+
+
+def bundle_resources() -> tuple[list[Resource], Resource, str]:
+    """Build the bundles; return them and their manifest as resources,
+    plus the version key of their content.
+
+    The manifest names the bundle pages and their content hashes, so it
+    must only be deployed once the bundles are.
+    """
+    # Only bundle deploys need the build dependencies
+    from build_res import BUNDLE_DIR, MANIFEST_FILE, build_bundles, bundle_version
+
+    manifest = build_bundles()
+    bundles: list[Resource] = list()
+    for bundle in manifest.values():
+        file_path = BUNDLE_DIR / bundle["file"]
+        bundles.append((file_path, read_file_from_path(file_path), bundle["page"]))
+    return (
+        bundles,
+        (MANIFEST_FILE, read_file_from_path(MANIFEST_FILE), BUNDLE_MANIFEST_PAGE),
+        bundle_version(manifest),
+    )
+
 
 def deploy_resources(
     session: MediaWikiSession,
-    res_type: str,
-    file_paths: Iterable[pathlib.Path],
+    resources: list[Resource],
     deploy_reason: str,
 ) -> tuple[bool, bool]:
-    all_deployed = True
-    changes_made = False
-    for file_path in file_paths:
-        print(f"::group::Checking {str(file_path)}")
-        file_content = read_file_from_path(file_path)
-        page = f"MediaWiki:Common.{'js' if res_type == '.js' else 'css'}/" + "/".join(
-            file_path.parts[2:]
-        )
-        print(f"...page = {page}")
-        deploy_result = session.deploy_file(
-            file_path, file_content, page, deploy_reason
-        )
-        all_deployed = all_deployed and deploy_result[0]
-        changes_made = changes_made or deploy_result[1]
-        print("::endgroup::")
-    return (all_deployed, changes_made)
+    """Deploy the resources whose content differs from the wiki's.
+
+    The SHA-1s of all target pages are fetched in one batched query, and
+    only files that differ are edited.
+    """
+    remote_sha1s = session.get_page_sha1s(page for _, _, page in resources)
+
+    changed_resources: list[Resource] = list()
+    for file_path, file_content, page in resources:
+        if remote_sha1s.get(page) == content_sha1(file_content):
+            print(f"{str(file_path)}...skipping - unchanged")
+        else:
+            changed_resources.append((file_path, file_content, page))
+
+    deploy_results = [
+        deploy_resource(session, file_path, file_content, page, deploy_reason)
+        for file_path, file_content, page in changed_resources
+    ]
+    return (
+        all(deployed for deployed, _ in deploy_results),
+        any(change_made for _, change_made in deploy_results),
+    )
 
 
-def update_cache(session: MediaWikiSession):
+def update_cache(session: MediaWikiSession, version: str | None = None):
+    if version is None:
+        version = (
+            subprocess.check_output(["git", "log", "-1", "--pretty=%h"])
+            .decode()
+            .strip()
+        )
     cache_result = session.make_action(
         "updatelpmwmessageapi",
         data={
             "messagename": "Resourceloaderarticles-cacheversion",
-            "value": subprocess.check_output(["git", "log", "-1", "--pretty=%h"])
-            .decode()
-            .strip(),
+            "value": version,
         },
     )
     if cache_result.get("message") == "Successfully changed the message value":
@@ -53,30 +117,61 @@ def update_cache(session: MediaWikiSession):
         exit(1)
 
 
+def build_argument_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--bundle",
+        action="store_true",
+        help="Deploy minified JS and CSS bundles built from Main.js and Main.scss, plus their manifest of content hashes, instead of the source files; the resource cache version is set from the bundle content. Special:RLA must load the bundle pages for this to take effect",
+    )
+    parser.add_argument(
+        "resource_files",
+        nargs="*",
+        type=pathlib.Path,
+        help="List of resource files to deploy (default: all)",
+    )
+    return parser
+
+
 def main():
-    all_deployed: bool = True
-    changes_made: bool = False
     resource_files: Iterable[pathlib.Path]
     git_deploy_reason: str
-    if len(sys.argv[1:]) == 0:
-        resource_files = itertools.chain(
-            pathlib.Path("./javascript/commons/").rglob("*.js"),
-            pathlib.Path("./stylesheets/commons/").rglob("*.scss"),
-        )
+    parser = build_argument_parser()
+    parsed_args = parser.parse_args()
+    if parsed_args.bundle and len(parsed_args.resource_files) > 0:
+        parser.error("--bundle builds from Main.js and Main.scss; no resource files")
+    if parsed_args.bundle:
+        resource_files = []
+        git_deploy_reason = get_git_deploy_reason()
+    elif len(parsed_args.resource_files) == 0:
+        resource_files = [
+            *pathlib.Path("./javascript/commons/").rglob("*.js"),
+            *pathlib.Path("./stylesheets/commons/").rglob("*.scss"),
+        ]
         git_deploy_reason = "Automated Weekly Re-Sync"
     else:
-        resource_files = [pathlib.Path(arg) for arg in sys.argv[1:]]
+        resource_files = parsed_args.resource_files
         git_deploy_reason = get_git_deploy_reason()
 
+    cache_version: str | None = None
     with MediaWikiSession("commons") as commons_session:
-        for res_type, files in itertools.groupby(
-            sorted(resource_files), lambda path: path.suffix
-        ):
-            group_all_deployed, group_changes_made = deploy_resources(
-                commons_session, res_type, list(files), git_deploy_reason
+        if parsed_args.bundle:
+            bundles, manifest, cache_version = bundle_resources()
+            all_deployed, changes_made = deploy_resources(
+                commons_session, bundles, git_deploy_reason
+            )
+            if all_deployed:
+                manifest_deployed, manifest_changed = deploy_resources(
+                    commons_session, [manifest], git_deploy_reason
+                )
+                all_deployed = manifest_deployed
+                changes_made = changes_made or manifest_changed
+        else:
+            all_deployed, changes_made = deploy_resources(
+                commons_session,
+                source_resources(sorted(resource_files)),
+                git_deploy_reason,
             )
-            all_deployed = all_deployed and group_all_deployed
-            changes_made = changes_made or group_changes_made
 
         if not all_deployed:
             print(
@@ -84,7 +179,9 @@ def main():
             )
             exit(1)
         elif changes_made:
-            update_cache(commons_session)
+            update_cache(commons_session, cache_version)
+        else:
+            print("No resources changed; resource cache version not updated")
 
 
 if __name__ == "__main__":
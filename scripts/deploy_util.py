@@ -1,17 +1,28 @@
+import concurrent.futures
 import functools
+import hashlib
+import json
 import os
 import pathlib
 import subprocess
+import sys
+import threading
 import time
 
 import requests
 
+from typing import Any, Callable, Iterable, Optional, TypeVar
+
 __all__ = [
+    "CACHE_DIR",
     "HEADER",
+    "READ_SLEEP_DURATION",
     "SLEEP_DURATION",
+    "content_sha1",
     "get_git_deploy_reason",
     "get_wikis",
     "read_file_from_path",
+    "run_concurrently",
     "write_to_github_summary_file",
 ]
 
@@ -25,17 +36,138 @@ HEADER = {
     "Content-Type": "application/x-www-form-urlencoded",
 }
 SLEEP_DURATION = 4
+READ_SLEEP_DURATION = 0.5
+# Local caches of all scripts, anchored at the repository root
+CACHE_DIR = pathlib.Path(__file__).resolve().parent.parent / "cache"
+WIKI_LIST_URL = "https://liquipedia.net/api.php"
+WIKI_LIST_CACHE_FILE = pathlib.Path(
+    os.getenv("WIKI_LIST_CACHE_FILE") or CACHE_DIR / "wikis.json"
+)
+WIKI_LIST_CACHE_TTL = int(os.getenv("WIKI_LIST_CACHE_TTL") or 24 * 60 * 60)
+
+T = TypeVar("T")
+
+_thread_output = threading.local()
+_output_lock = threading.Lock()
+
+
+def _label_line(label: str, line: str) -> Optional[str]:
+    # Workflow commands only work at the start of a line. Groups of
+    # concurrent calls would swallow each other's lines, so they are dropped
+    if line.startswith("::group::"):
+        return f"[{label}] {line[len('::group::') :]}"
+    if line == "::endgroup::":
+        return None
+    if line.startswith("::"):
+        return line
+    return f"[{label}] {line}"
+
+
+class _ThreadOutputRouter:
+    """Stdout replacement that writes each line of a labelled thread as soon
+    as it is complete, prefixed with the thread's label."""
+
+    def __init__(self, stream):
+        self.__stream = stream
+
+    def write(self, text: str) -> int:
+        label = getattr(_thread_output, "label", None)
+        if label is None:
+            with _output_lock:
+                return self.__stream.write(text)
+        lines = (_thread_output.partial_line + text).split("\n")
+        _thread_output.partial_line = lines.pop()
+        self.write_lines(label, lines)
+        return len(text)
+
+    def write_lines(self, label: str, lines: list[str]):
+        with _output_lock:
+            for line in lines:
+                labelled_line = _label_line(label, line)
+                if labelled_line is not None:
+                    self.__stream.write(labelled_line + "\n")
+            self.__stream.flush()
+
+    def flush(self):
+        with _output_lock:
+            self.__stream.flush()
+
+    def __getattr__(self, name: str):
+        return getattr(self.__stream, name)
+
+
+def _read_wiki_list_cache() -> Optional[dict[str, Any]]:
+    """Return the cached wiki list; a missing or malformed cache is None."""
+    try:
+        with WIKI_LIST_CACHE_FILE.open("r") as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+    if (
+        not isinstance(cache, dict)
+        or not isinstance(cache.get("fetched"), (int, float))
+        or not isinstance(cache.get("wikis"), list)
+    ):
+        return None
+    return cache
+
+
+def _write_wiki_list_cache(cache: dict[str, Any]):
+    try:
+        WIKI_LIST_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with WIKI_LIST_CACHE_FILE.open("w") as cache_file:
+            json.dump(cache, cache_file)
+    except OSError as e:
+        print(f"::warning::could not write wiki list cache: {str(e)}")
 
 
 @functools.cache
 def get_wikis() -> frozenset[str]:
-    response = requests.get(
-        "https://liquipedia.net/api.php",
-        headers=HEADER,
+    """Names of all wikis, cached on disk for WIKI_LIST_CACHE_TTL seconds.
+
+    Expired caches are revalidated with ETag/If-Modified-Since. If the list
+    can't be fetched, a stale cache is used; without one, the error is raised,
+    as every caller edits all wikis and must not work from a partial list.
+    """
+    cache = _read_wiki_list_cache()
+    if cache is not None and time.time() - cache["fetched"] < WIKI_LIST_CACHE_TTL:
+        return frozenset(cache["wikis"])
+
+    headers = dict(HEADER)
+    if cache is not None:
+        if cache.get("etag"):
+            headers["If-None-Match"] = cache["etag"]
+        if cache.get("last_modified"):
+            headers["If-Modified-Since"] = cache["last_modified"]
+    try:
+        response = requests.get(WIKI_LIST_URL, headers=headers, timeout=30)
+        if response.status_code == 304 and cache is not None:
+            wikis = cache["wikis"]
+        else:
+            response.raise_for_status()
+            wikis = sorted(response.json()["allwikis"].keys())
+    except (requests.RequestException, ValueError, KeyError) as e:
+        if cache is not None:
+            print(f"::warning::could not refresh wiki list, using cache: {str(e)}")
+            return frozenset(cache["wikis"])
+        print(f"::error::could not fetch wiki list: {str(e)}")
+        raise
+
+    _write_wiki_list_cache(
+        {
+            "fetched": time.time(),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "wikis": wikis,
+        }
     )
-    wikis = response.json()
-    time.sleep(SLEEP_DURATION)
-    return frozenset(wikis["allwikis"].keys())
+    return frozenset(wikis)
+
+
+def content_sha1(text: str) -> str:
+    # MediaWiki strips trailing whitespace on save, so the stored revision
+    # (and its SHA-1) never contains it
+    return hashlib.sha1(text.rstrip().encode("utf-8")).hexdigest()
 
 
 def get_git_deploy_reason():
@@ -51,8 +183,44 @@ def read_file_from_path(file_path: pathlib.Path) -> str:
         return file.read()
 
 
+def _call_labelled(router: _ThreadOutputRouter, label: str, function, arguments):
+    _thread_output.label = label
+    _thread_output.partial_line = ""
+    try:
+        return function(*arguments)
+    finally:
+        if _thread_output.partial_line:
+            router.write_lines(label, [_thread_output.partial_line])
+        del _thread_output.label
+        del _thread_output.partial_line
+
+
+def run_concurrently(
+    function: Callable[..., T], argument_lists: Iterable[tuple[Any, ...]], jobs: int
+) -> list[T]:
+    """Call `function` once per argument tuple on up to `jobs` threads.
+
+    With more than one job, console output is written line by line as it is
+    produced, each line prefixed with the call's first argument (the wiki),
+    so slow or stuck calls show up in the log while they run.
+    """
+    argument_lists = list(argument_lists)
+    if jobs <= 1:
+        return [function(*arguments) for arguments in argument_lists]
+    if not isinstance(sys.stdout, _ThreadOutputRouter):
+        sys.stdout = _ThreadOutputRouter(sys.stdout)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(
+                _call_labelled, sys.stdout, str(arguments[0]), function, arguments
+            )
+            for arguments in argument_lists
+        ]
+        return [future.result() for future in futures]
+
+
 def write_to_github_summary_file(text: str):
     if not GITHUB_STEP_SUMMARY_FILE:
         return
-    with open(GITHUB_STEP_SUMMARY_FILE, "a") as summary:
+    with _output_lock, open(GITHUB_STEP_SUMMARY_FILE, "a") as summary:
         summary.write(f"{text}\n")
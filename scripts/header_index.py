@@ -0,0 +1,100 @@
+import contextlib
+import json
+import os
+import pathlib
+import re
+import threading
+
+from typing import Optional
+
+from deploy_util import CACHE_DIR
+
+__all__ = [
+    "HEADER_PATTERN",
+    "HeaderIndex",
+]
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+HEADER_INDEX_FILE = pathlib.Path(
+    os.getenv("HEADER_INDEX_FILE") or CACHE_DIR / "header_index.json"
+)
+# Enough for the three header lines with a page name of maximum length
+HEADER_READ_SIZE = 512
+# Bump whenever HEADER_PATTERN changes, to invalidate indexed page names
+HEADER_INDEX_VERSION = 1
+
+HEADER_PATTERN = re.compile(
+    r"\A---\n" r"-- @Liquipedia\n" r"-- page=(?P<pageName>[^\n]*)\n"
+)
+
+
+class HeaderIndex(contextlib.AbstractContextManager):
+    """Persistent file -> page name index of the `-- page=` magic comments.
+
+    Only the first HEADER_READ_SIZE characters of a file are read, and only
+    when its size or modification time differ from the indexed ones. The
+    index is written back on exit, if anything changed. Safe to share
+    between threads.
+    """
+
+    __dirty: bool
+    __entries: dict[str, list]
+    __index_file: pathlib.Path
+    __lock: threading.Lock
+
+    def __init__(self, index_file: pathlib.Path = HEADER_INDEX_FILE):
+        self.__dirty = False
+        self.__index_file = index_file
+        self.__lock = threading.Lock()
+        try:
+            with index_file.open("r") as file:
+                index = json.load(file)
+            self.__entries = (
+                index["files"] if index.get("version") == HEADER_INDEX_VERSION else {}
+            )
+        except (OSError, ValueError, KeyError):
+            self.__entries = dict()
+
+    @staticmethod
+    def __key(path: pathlib.Path) -> str:
+        absolute_path = path.resolve()
+        if absolute_path.is_relative_to(REPO_ROOT):
+            return absolute_path.relative_to(REPO_ROOT).as_posix()
+        return absolute_path.as_posix()
+
+    def page(self, path: pathlib.Path) -> Optional[str]:
+        """Page name a file deploys to, or None without magic comment."""
+        stat = path.stat()
+        key = self.__key(path)
+        with self.__lock:
+            entry = self.__entries.get(key)
+        if entry is not None and entry[:2] == [stat.st_mtime_ns, stat.st_size]:
+            return entry[2]
+        with path.open("r", encoding="utf-8") as file:
+            header_match = HEADER_PATTERN.match(file.read(HEADER_READ_SIZE))
+        page = header_match.groupdict()["pageName"] if header_match else None
+        with self.__lock:
+            self.__entries[key] = [stat.st_mtime_ns, stat.st_size, page]
+            self.__dirty = True
+        return page
+
+    def pages(self, directory: pathlib.Path) -> dict[pathlib.Path, Optional[str]]:
+        """Page name of every Lua file under directory, by file."""
+        return {path: self.page(path) for path in sorted(directory.rglob("*.lua"))}
+
+    def save(self):
+        with self.__lock:
+            if not self.__dirty:
+                return
+            self.__index_file.parent.mkdir(parents=True, exist_ok=True)
+            # Write aside and swap in, so concurrent runs never read a partial file
+            temporary_file = self.__index_file.with_suffix(f".{os.getpid()}.tmp")
+            with temporary_file.open("w") as file:
+                json.dump(
+                    {"version": HEADER_INDEX_VERSION, "files": self.__entries}, file
+                )
+            temporary_file.replace(self.__index_file)
+            self.__dirty = False
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.save()
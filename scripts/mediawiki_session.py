@@ -1,19 +1,25 @@
+import collections
+import concurrent.futures
 import contextlib
 import functools
 import http.cookiejar
+import itertools
 import os
 import pathlib
-import time
+import threading
 
 import requests
+import requests.adapters
 
-from typing import Any, Optional
+from typing import Any, Iterable, Iterator, Optional
 
 from deploy_util import (
     HEADER,
+    READ_SLEEP_DURATION,
     SLEEP_DURATION,
     write_to_github_summary_file,
 )
+from rate_limiter import RateLimiter, TokenBucket
 
 __all__ = [
     "MediaWikiSession",
@@ -26,6 +32,40 @@ DRY_RUN = bool(int(os.getenv("DRY_RUN", 0)))
 WIKI_BASE_URL = os.getenv("WIKI_BASE_URL")
 WIKI_USER = os.getenv("WIKI_USER")
 WIKI_PASSWORD = os.getenv("WIKI_PASSWORD")
+QUERY_BATCH_SIZE = 50
+MAXLAG = 5
+MAX_RETRIES = 5
+READ_ACTIONS = frozenset({"query"})
+RETRY_STATUS_CODES = frozenset({429, 503})
+COOKIE_JAR_FILE = "cookies/cookie_jar.ck"
+CONNECTION_POOL_SIZE = 16
+
+# All wikis share a single sign-on domain, so one cookie jar and the CSRF
+# tokens fetched with it are reused by every session of the process.
+_credential_lock = threading.Lock()
+_csrf_tokens: dict[str, str] = dict()
+_token_locks: collections.defaultdict[str, threading.Lock] = collections.defaultdict(
+    threading.Lock
+)
+# Likewise, all wikis are served from one host, so sessions share a pool of
+# keep-alive connections
+_http_adapter = requests.adapters.HTTPAdapter(
+    pool_connections=1, pool_maxsize=CONNECTION_POOL_SIZE
+)
+
+
+@functools.cache
+def _read_cookie_jar() -> http.cookiejar.FileCookieJar:
+    pathlib.Path(COOKIE_JAR_FILE).parent.mkdir(exist_ok=True)
+    cookie_jar = http.cookiejar.LWPCookieJar(filename=COOKIE_JAR_FILE)
+    with contextlib.suppress(OSError):
+        cookie_jar.load(ignore_discard=True)
+    return cookie_jar
+
+
+def _save_cookie_jar():
+    with _credential_lock:
+        _read_cookie_jar().save(ignore_discard=True)
 
 
 class MediaWikiSessionError(IOError):
@@ -33,25 +73,23 @@ class MediaWikiSessionError(IOError):
 
 
 class MediaWikiSession(contextlib.AbstractContextManager):
-    __cookie_jar: http.cookiejar.FileCookieJar
+    __rate_limiter: RateLimiter
     __session: requests.Session
     __wiki: str
 
-    def __init__(self, wiki: str):
+    def __init__(self, wiki: str, budget: Optional[TokenBucket] = None):
+        """`budget` is an optional request budget shared with other sessions."""
+        self.__rate_limiter = RateLimiter(
+            1 / READ_SLEEP_DURATION, 1 / SLEEP_DURATION, budget
+        )
         self.__wiki = wiki
-        self.__cookie_jar = self.__read_cookie_jar()
         self.__session = requests.session()
-        self.__session.cookies = self.__cookie_jar
+        self.__session.mount("https://", _http_adapter)
+        self.__session.mount("http://", _http_adapter)
+        with _credential_lock:
+            self.__session.cookies = _read_cookie_jar()
         self.__session.headers.update(HEADER)
 
-    def __read_cookie_jar(self) -> http.cookiejar.FileCookieJar:
-        pathlib.Path("cookies").mkdir(exist_ok=True)
-        ckf = f"cookies/cookie_{self.wiki}.ck"
-        cookie_jar = http.cookiejar.LWPCookieJar(filename=ckf)
-        with contextlib.suppress(OSError):
-            cookie_jar.load(ignore_discard=True)
-        return cookie_jar
-
     @functools.cache
     def __get_wiki_api_url(self):
         return f"{WIKI_BASE_URL}/{self.wiki}/api.php"
@@ -68,19 +106,31 @@ class MediaWikiSession(contextlib.AbstractContextManager):
                 "lgtoken": token_response["tokens"]["logintoken"],
             },
         )
-        self.__cookie_jar.save(ignore_discard=True)
-        self.cooldown()
+        _save_cookie_jar()
+
+    def __fetch_token(self) -> str:
+        # Cookies of an earlier login (on any wiki) are checked with a single
+        # userinfo query before paying for a fresh login
+        result = self.make_action("query", params={"meta": "userinfo|tokens"})
+        if "anon" not in result["userinfo"]:
+            return result["tokens"]["csrftoken"]
+        self._login()
+        return self.make_action("query", params={"meta": "tokens"})["tokens"][
+            "csrftoken"
+        ]
 
     @functools.cached_property
     def token(self) -> str:
         if DRY_RUN:
             return "DRY_RUN_DUMMY_TOKEN"
-        self._login()
-        token = self.make_action("query", params={"meta": "tokens"})["tokens"][
-            "csrftoken"
-        ]
-        if ACTIONS_STEP_DEBUG:
-            print(f"::add-mask::{token}")
+        with _credential_lock:
+            token_lock = _token_locks[self.wiki]
+        with token_lock:
+            token = _csrf_tokens.get(self.wiki)
+            if token is None:
+                token = _csrf_tokens[self.wiki] = self.__fetch_token()
+                if ACTIONS_STEP_DEBUG:
+                    print(f"::add-mask::{token}")
         return token
 
     @property
@@ -90,34 +140,136 @@ class MediaWikiSession(contextlib.AbstractContextManager):
     def make_action(
         self, action: str, params: Optional[dict] = None, data: Optional[dict] = None
     ) -> dict[str, Any]:
-        merged_params = {"format": "json", "action": action}
-        if params is not None:
-            merged_params |= params
+        merged_params = self.__merge_params(action, params)
         if DRY_RUN:
             print(f"HEADER: {HEADER}")
             print(f"PARAM: {merged_params}")
             print(f"DATA: {data}")
             return True, False
-        response = self.__session.post(
-            self.__get_wiki_api_url(), params=merged_params, data=data
-        )
-        if ACTIONS_STEP_DEBUG:
-            print(f"params: {merged_params}")
-            print(f"data: {data}")
-            print(f"HTTP Status: {response.status_code}")
-            print(f'Raw response: "{response}"')
-        try:
-            parsed_response: dict[str, Any] = response.json()
+        return self.__post(merged_params, data)[action]
+
+    def paginate_query(self, data: dict) -> Iterator[dict[str, Any]]:
+        """Yield the query result of a list query and all its continuations.
+
+        The next continuation is requested in the background while the caller
+        works through the current one. Nothing is queried in dry runs.
+        """
+        merged_params = self.__merge_params("query", None)
+        if DRY_RUN:
+            print(f"HEADER: {HEADER}")
+            print(f"PARAM: {merged_params}")
+            print(f"DATA: {data}")
+            return
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            pending = executor.submit(self.__post, merged_params, data)
+            while pending is not None:
+                response = pending.result()
+                continuation = response.get("continue")
+                pending = (
+                    executor.submit(
+                        self.__post, merged_params, {**data, **continuation}
+                    )
+                    if continuation
+                    else None
+                )
+                yield response.get("query", {})
+
+    @staticmethod
+    def __merge_params(action: str, params: Optional[dict]) -> dict[str, Any]:
+        merged_params = {"format": "json", "action": action, "maxlag": MAXLAG}
+        if params is not None:
+            merged_params |= params
+        return merged_params
+
+    def __post(self, merged_params: dict, data: Optional[dict]) -> dict[str, Any]:
+        write = merged_params["action"] not in READ_ACTIONS
+        for attempt in itertools.count():
+            self.__rate_limiter.wait(write)
+            response = self.__session.post(
+                self.__get_wiki_api_url(), params=merged_params, data=data
+            )
+            if ACTIONS_STEP_DEBUG:
+                print(f"params: {merged_params}")
+                print(f"data: {data}")
+                print(f"HTTP Status: {response.status_code}")
+                print(f'Raw response: "{response}"')
+            retry_after = response.headers.get("Retry-After")
+            if response.status_code in RETRY_STATUS_CODES and attempt < MAX_RETRIES:
+                delay = self.__rate_limiter.back_off(attempt, retry_after)
+                print(f"...HTTP {response.status_code}, retrying in {delay:.0f}s")
+                continue
+            try:
+                parsed_response: dict[str, Any] = response.json()
+            except requests.JSONDecodeError:
+                raise MediaWikiSessionError(
+                    f"{response.status_code} ({response.reason}): {response.text}"
+                )
             if "error" in parsed_response.keys():
-                raise MediaWikiSessionError(parsed_response["error"]["info"])
-            return parsed_response[action]
-        except requests.JSONDecodeError:
-            raise MediaWikiSessionError(
-                f"{response.status_code} ({response.reason}): {response.text}"
+                error = parsed_response["error"]
+                if error.get("code") == "maxlag" and attempt < MAX_RETRIES:
+                    delay = self.__rate_limiter.back_off(attempt, retry_after)
+                    print(f"...server lagged, retrying in {delay:.0f}s")
+                    continue
+                raise MediaWikiSessionError(error["info"])
+            return parsed_response
+
+    def query_pages(
+        self, titles: Iterable[str], data: dict
+    ) -> Iterator[tuple[str, dict[str, Any]]]:
+        """Run a prop query for `titles` in batches of QUERY_BATCH_SIZE.
+
+        Yields (requested title, page) pairs, mapping titles the API
+        normalized back to the spelling that was asked for.
+        """
+        titles = list(titles)
+        for start in range(0, len(titles), QUERY_BATCH_SIZE):
+            result = self.make_action(
+                "query",
+                data={
+                    "titles": "|".join(titles[start : start + QUERY_BATCH_SIZE]),
+                    **data,
+                },
             )
+            normalized = {
+                entry["to"]: entry["from"] for entry in result.get("normalized", [])
+            }
+            for page in result.get("pages", {}).values():
+                yield normalized.get(page["title"], page["title"]), page
 
-    def cooldown(self):
-        time.sleep(SLEEP_DURATION)
+    def get_missing_pages(self, titles: Iterable[str]) -> set[str]:
+        """Return the subset of `titles` that do not exist on the wiki.
+
+        Raises MediaWikiSessionError if any title is invalid. In dry runs
+        nothing is queried and every title is reported missing.
+        """
+        if DRY_RUN:
+            return set(titles)
+        missing_pages: set[str] = set()
+        invalid_pages: list[str] = list()
+        for title, page in self.query_pages(titles, {"prop": "info"}):
+            if "invalid" in page:
+                invalid_pages.append(f"{title} ({page.get('invalidreason')})")
+            elif "missing" in page:
+                missing_pages.add(title)
+        if invalid_pages:
+            raise MediaWikiSessionError(f"invalid titles: {', '.join(invalid_pages)}")
+        return missing_pages
+
+    def get_page_sha1s(self, titles: Iterable[str]) -> dict[str, Optional[str]]:
+        """Fetch the SHA-1 of the current revision of each title in bulk.
+
+        Missing pages map to None. In dry runs nothing is queried and an empty
+        dict is returned, so every page is treated as changed.
+        """
+        sha1s: dict[str, Optional[str]] = dict()
+        if DRY_RUN:
+            return sha1s
+        for title, page in self.query_pages(
+            titles, {"prop": "revisions", "rvprop": "sha1"}
+        ):
+            revisions = page.get("revisions")
+            sha1s[title] = revisions[0].get("sha1") if revisions else None
+        return sha1s
 
     def deploy_file(
         self,
@@ -173,12 +325,11 @@ class MediaWikiSession(contextlib.AbstractContextManager):
             )
             deployed = False
             return deployed, change_made
-        finally:
-            self.cooldown()
 
     def close(self):
-        self.__cookie_jar.save(ignore_discard=True)
-        self.__session.close()
+        # Not closing the requests session: its only adapter is the connection
+        # pool shared with the other sessions
+        _save_cookie_jar()
 
     def __enter__(self):
         return self
@@ -6,7 +6,7 @@ Each pattern is reported as a single total.
 
 Only lua/wikis is scanned, so specs (lua/spec), type definitions
 (lua/definitions) and vendored code (lua/3rd) are excluded by construction.
-Comment-only lines are skipped.
+Matches inside comments and string literals are not counted.
 
 To track a new pattern, add an entry to PATTERNS below. Its name becomes a new
 column in --csv output; keep existing names stable so the time series stays
@@ -14,6 +14,11 @@ comparable.
 
 Usage:
     python3 scripts/metrics/deprecated_patterns.py [--csv] [--no-header] [--files]
+        [--jobs N] [--no-cache] [--since YYYY-MM-DD [--every DAYS]]
+
+--since backfills the time series (CSV only): one row per --every days
+(default 7) from that date to today, computed from the last commit of each
+day without checking anything out.
 
 Intended to be run on a schedule (e.g. weekly CI job) with --csv appended to a
 time-series file, so standardization / Phoenix progress can be charted.
@@ -21,13 +26,20 @@ time-series file, so standardization / Phoenix progress can be charted.
 
 import argparse
 import csv
-import re
 import sys
 from datetime import date
 from pathlib import Path
 
-REPO_ROOT = Path(__file__).resolve().parent.parent.parent
-WIKIS_DIR = REPO_ROOT / "lua" / "wikis"
+from lua_scan import (
+    DEFAULT_JOBS,
+    REPO_ROOT,
+    FileStats,
+    backfill,
+    compile_patterns,
+    read_lua,
+    scan_text,
+    scan_tree,
+)
 
 PATTERNS: dict[str, dict] = {
     "widget2": {
@@ -48,37 +60,45 @@ PATTERNS: dict[str, dict] = {
     },
 }
 
-COMPILED = {
-    name: [re.compile(regex) for regex in spec["regexes"]]
-    for name, spec in PATTERNS.items()
-}
+COMPILED = compile_patterns({name: spec["regexes"] for name, spec in PATTERNS.items()})
 
 
 def count_file(path: Path) -> dict[str, int]:
     """Return per-pattern call-site counts for a Lua file."""
-    lines = [
-        line
-        for line in path.read_text(encoding="utf-8", errors="replace").splitlines()
-        if not line.strip().startswith("--")
-    ]
-    return {
-        name: sum(len(regex.findall(line)) for regex in regexes for line in lines)
-        for name, regexes in COMPILED.items()
-    }
+    return scan_text(read_lua(path), COMPILED)[2]
 
 
-def collect() -> tuple[dict[str, int], dict[str, list[tuple[Path, int]]]]:
+def tally(
+    files: list[FileStats],
+) -> tuple[dict[str, int], dict[str, list[tuple[Path, int]]]]:
     """Return (per-pattern totals, per-pattern list of (file, count) hits)."""
     totals = dict.fromkeys(PATTERNS, 0)
     hits: dict[str, list[tuple[Path, int]]] = {name: [] for name in PATTERNS}
-    for lua_file in sorted(WIKIS_DIR.rglob("*.lua")):
-        for name, count in count_file(lua_file).items():
+    for file_stats in files:
+        for name, count in file_stats.patterns.items():
             if count:
                 totals[name] += count
-                hits[name].append((lua_file.relative_to(REPO_ROOT), count))
+                hits[name].append((file_stats.path.relative_to(REPO_ROOT), count))
     return totals, hits
 
 
+def collect(
+    jobs: int = 1, use_cache: bool = True
+) -> tuple[dict[str, int], dict[str, list[tuple[Path, int]]]]:
+    """Return (per-pattern totals, per-pattern list of (file, count) hits)."""
+    return tally(scan_tree(COMPILED, jobs, use_cache))
+
+
+def collect_history(
+    since: date, every: int, jobs: int = 1, use_cache: bool = True
+) -> list[dict]:
+    """CSV rows for every `every` days since `since`, read from git history."""
+    return [
+        {"date": day.isoformat(), **tally(files)[0]}
+        for day, files in backfill(COMPILED, since, every, jobs, use_cache)
+    ]
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument(
@@ -87,6 +107,31 @@ def main() -> None:
     parser.add_argument(
         "--files", action="store_true", help="list the files containing each pattern"
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=DEFAULT_JOBS,
+        help="number of processes scanning files (default: one per CPU, at most 8)",
+    )
+    parser.add_argument(
+        "--cache",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="reuse results for files unchanged since an earlier run "
+        "(keyed by git blob, stored in cache/lua_scan.json)",
+    )
+    parser.add_argument(
+        "--since",
+        type=date.fromisoformat,
+        help="backfill: one data point every --every days from this date "
+        "(YYYY-MM-DD) to today, read from git history (requires --csv)",
+    )
+    parser.add_argument(
+        "--every",
+        type=int,
+        default=7,
+        help="days between backfilled data points (default: 7)",
+    )
     parser.add_argument(
         "--header",
         action=argparse.BooleanOptionalAction,
@@ -95,16 +140,26 @@ def main() -> None:
         "to an existing time-series file)",
     )
     args = parser.parse_args()
-
-    totals, hits = collect()
+    if args.since and not args.csv:
+        parser.error("--since requires --csv")
+    if args.every < 1:
+        parser.error("--every must be at least 1")
 
     if args.csv:
         writer = csv.DictWriter(sys.stdout, fieldnames=["date", *PATTERNS])
         if args.header:
             writer.writeheader()
-        writer.writerow({"date": date.today().isoformat(), **totals})
+        if args.since:
+            writer.writerows(
+                collect_history(args.since, args.every, args.jobs, args.cache)
+            )
+        else:
+            totals, _ = collect(args.jobs, args.cache)
+            writer.writerow({"date": date.today().isoformat(), **totals})
         return
 
+    totals, hits = collect(args.jobs, args.cache)
+
     width = max(len(name) for name in PATTERNS)
     for name, spec in PATTERNS.items():
         if args.files:
@@ -0,0 +1,57 @@
+"""Minimal Lua lexer shared by the LOC and pattern metrics.
+
+Separates code from comments and string literals in a single left-to-right
+regex pass (linear in the source size): line comments, --[==[ block ]==]
+comments, short strings with escapes, and [==[ long ]==] strings. Anything
+that is not a comment or string is code. Nothing else is tokenized.
+"""
+
+import re
+from typing import Optional
+
+# Bump whenever the classification changes, to invalidate cached counts
+LEXER_VERSION = 1
+
+# At every position the earliest-starting token wins, so "--" inside a
+# string and quotes inside a comment are never mistaken for tokens.
+# Unterminated long brackets fall through to a line comment / bracket;
+# unterminated short strings end at the line break, as far as the lexer
+# is concerned.
+TOKEN_RE = re.compile(
+    r"""
+      --\[(?P<comment_level>=*)\[.*?\](?P=comment_level)\]
+    | --[^\n]*
+    | \[(?P<string_level>=*)\[.*?\](?P=string_level)\]
+    | "(?:[^"\\\n]|\\.)*"?
+    | '(?:[^'\\\n]|\\.)*'?
+    """,
+    re.DOTALL | re.VERBOSE,
+)
+
+
+def mask_token(match: re.Match) -> str:
+    token = match.group()
+    newlines = token.count("\n")
+    if token.startswith("--"):
+        return "\n" * newlines
+    # Every line a string literal spans keeps a placeholder, so it still
+    # counts as code, but its content can't match any pattern
+    return '""' + '\n""' * newlines
+
+
+def code_only(source: str) -> str:
+    """Return source with comments removed and string literals replaced by
+    "" placeholders, one per line they span; line breaks are preserved."""
+    return TOKEN_RE.sub(mask_token, source)
+
+
+def count_loc(source: str, code: Optional[str] = None) -> tuple[int, int]:
+    """Return (physical_lines, loc); LOC = lines holding code or part of a
+    string literal, i.e. neither blank nor only comment.
+
+    code is code_only(source), for callers that already masked it.
+    """
+    if code is None:
+        code = code_only(source)
+    loc = sum(1 for line in code.splitlines() if line.strip())
+    return len(source.splitlines()), loc
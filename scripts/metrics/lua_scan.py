@@ -0,0 +1,283 @@
+"""Shared single-pass scanner for the repo metrics.
+
+Reads every Lua file once and computes everything repo_loc.py and
+deprecated_patterns.py report on it: physical lines, LOC and deprecated
+pattern counts. Files are spread over a process pool. repo_metrics.py
+writes the output of both scripts from a single scan.
+
+Results are cached per git blob (cache/lua_scan.json), so a run only
+scans files whose content changed since any earlier run, and the same
+entries serve historical commits: backfill() reads past trees straight
+from the git object store, without checking anything out.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import re
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional
+
+import lua_lexer
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+WIKIS_DIR = REPO_ROOT / "lua" / "wikis"
+
+CACHE_FILE = REPO_ROOT / "cache" / "lua_scan.json"
+
+# One scanning process per CPU, but not more than a shared CI runner can use
+DEFAULT_JOBS = min(os.cpu_count() or 1, 8)
+# Bump whenever the counting rules change, to invalidate cached results
+SCAN_VERSION = 2
+
+
+class FileStats(NamedTuple):
+    path: Path
+    lines: int
+    loc: int
+    patterns: dict[str, int]
+
+
+class PatternMatcher(NamedTuple):
+    """Every regex of every pattern folded into one alternation.
+
+    Each regex becomes a named group; group_names maps the group back to its
+    pattern, so a single finditer over a file counts all patterns at once.
+    """
+
+    regex: Optional[re.Pattern]
+    group_names: dict[str, str]
+    names: tuple[str, ...]
+
+    @property
+    def signature(self) -> str:
+        """Identifies the counting rules, for cache invalidation."""
+        source = self.regex.pattern if self.regex is not None else ""
+        return hashlib.sha1(
+            f"{SCAN_VERSION}|{lua_lexer.LEXER_VERSION}|{'|'.join(self.names)}|{source}".encode()
+        ).hexdigest()
+
+    def count(self, text: str) -> dict[str, int]:
+        counts = dict.fromkeys(self.names, 0)
+        if self.regex is not None:
+            for match in self.regex.finditer(text):
+                counts[self.group_names[match.lastgroup]] += 1
+        return counts
+
+
+def compile_patterns(patterns: dict[str, list[str]]) -> PatternMatcher:
+    """Build a PatternMatcher from pattern name -> list of regex sources.
+
+    The regexes must not define named groups of their own.
+    """
+    group_names: dict[str, str] = {}
+    alternatives: list[str] = []
+    for index, (name, regexes) in enumerate(patterns.items()):
+        for regex_index, regex in enumerate(regexes):
+            group = f"p{index}_{regex_index}"
+            group_names[group] = name
+            alternatives.append(f"(?P<{group}>{regex})")
+    regex = re.compile("|".join(alternatives)) if alternatives else None
+    return PatternMatcher(regex, group_names, tuple(patterns))
+
+
+def read_lua(path: Path) -> str:
+    return path.read_text(encoding="utf-8", errors="replace")
+
+
+def scan_text(text: str, patterns: PatternMatcher) -> tuple[int, int, dict]:
+    """Return (physical_lines, loc, per-pattern counts) for Lua source.
+
+    LOC = lines holding code or string literals; patterns are only counted
+    in code, never inside comments or strings (see lua_lexer).
+    """
+    code = lua_lexer.code_only(text)
+    return *lua_lexer.count_loc(text, code), patterns.count(code)
+
+
+def scan_file(path: Path, patterns: PatternMatcher) -> FileStats:
+    return FileStats(path, *scan_text(read_lua(path), patterns))
+
+
+def scan(paths: list[Path], patterns: PatternMatcher, jobs: int) -> list[FileStats]:
+    """Scan paths on up to jobs processes; results are in path order."""
+    scan_one = functools.partial(scan_file, patterns=patterns)
+    if jobs <= 1:
+        return list(map(scan_one, paths))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(scan_one, paths, chunksize=64))
+
+
+def scan_texts(
+    texts: list[str], patterns: PatternMatcher, jobs: int
+) -> list[tuple[int, int, dict]]:
+    """scan_text() for each text on up to jobs processes, in order."""
+    scan_one = functools.partial(scan_text, patterns=patterns)
+    if jobs <= 1:
+        return list(map(scan_one, texts))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(scan_one, texts, chunksize=64))
+
+
+def git(*args: str) -> str:
+    return subprocess.run(
+        ["git", *args], cwd=REPO_ROOT, capture_output=True, check=True
+    ).stdout.decode()
+
+
+def git_blobs(directory: Path) -> dict[Path, str]:
+    """Map tracked, unmodified files under directory to their git blob id.
+
+    Files modified in the working tree or untracked are left out, as are all
+    files when git is unavailable.
+    """
+    try:
+        staged = git("ls-files", "-s", "-z", "--", str(directory))
+        dirty = git("ls-files", "-m", "-z", "--", str(directory))
+    except (OSError, subprocess.CalledProcessError):
+        return {}
+    dirty_paths = {REPO_ROOT / path for path in dirty.split("\0") if path}
+    blobs: dict[Path, str] = {}
+    for entry in staged.split("\0"):
+        if not entry:
+            continue
+        info, path = entry.split("\t", 1)
+        full_path = REPO_ROOT / path
+        if full_path not in dirty_paths:
+            blobs[full_path] = info.split()[1]
+    return blobs
+
+
+def load_cache(patterns: PatternMatcher) -> dict[str, list]:
+    """Return cached results, blob id -> [lines, loc, pattern counts]."""
+    try:
+        cache = json.loads(CACHE_FILE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if cache.get("signature") != patterns.signature:
+        return {}
+    return cache["blobs"]
+
+
+def save_cache(patterns: PatternMatcher, blobs: dict[str, list]) -> None:
+    CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    CACHE_FILE.write_text(
+        json.dumps({"signature": patterns.signature, "blobs": blobs}),
+        encoding="utf-8",
+    )
+
+
+def scan_tree(
+    patterns: PatternMatcher, jobs: int, use_cache: bool = True
+) -> list[FileStats]:
+    """Scan every Lua file under lua/wikis, sorted by path.
+
+    With use_cache, files whose git blob has been scanned before (with the
+    same patterns) are not read again.
+    """
+    paths = sorted(WIKIS_DIR.rglob("*.lua"))
+    if not use_cache:
+        return scan(paths, patterns, jobs)
+
+    blob_ids = git_blobs(WIKIS_DIR)
+    cache = load_cache(patterns)
+    results: dict[Path, FileStats] = {}
+    to_scan: list[Path] = []
+    for path in paths:
+        cached = cache.get(blob_ids.get(path, ""))
+        if cached is not None:
+            results[path] = FileStats(path, *cached)
+        else:
+            to_scan.append(path)
+    for file_stats in scan(to_scan, patterns, jobs):
+        results[file_stats.path] = file_stats
+        if file_stats.path in blob_ids:
+            cache[blob_ids[file_stats.path]] = list(file_stats[1:])
+    if to_scan:
+        save_cache(patterns, cache)
+    return [results[path] for path in paths]
+
+
+class BlobReader:
+    """Reads blobs through one long-running `git cat-file --batch`."""
+
+    def __init__(self):
+        self.process = subprocess.Popen(
+            ["git", "cat-file", "--batch"],
+            cwd=REPO_ROOT,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+
+    def read(self, blob_id: str) -> bytes:
+        self.process.stdin.write(f"{blob_id}\n".encode())
+        self.process.stdin.flush()
+        header = self.process.stdout.readline().split()
+        if len(header) != 3:
+            raise KeyError(f"blob not found: {blob_id}")
+        data = self.process.stdout.read(int(header[2]))
+        self.process.stdout.read(1)  # trailing newline
+        return data
+
+    def close(self) -> None:
+        self.process.stdin.close()
+        self.process.wait()
+
+
+def scan_commit(
+    commit: str,
+    patterns: PatternMatcher,
+    jobs: int,
+    cache: dict[str, list],
+    reader: BlobReader,
+) -> list[FileStats]:
+    """Scan the lua/wikis tree of a commit; blobs missing from cache are
+    read from the object store, scanned and added to it."""
+    entries: list[tuple[Path, str]] = []
+    for entry in git("ls-tree", "-r", "-z", commit, "--", "lua/wikis").split("\0"):
+        if not entry:
+            continue
+        info, path = entry.split("\t", 1)
+        _, object_type, blob_id = info.split()
+        if object_type == "blob" and path.endswith(".lua"):
+            entries.append((REPO_ROOT / path, blob_id))
+    missing = sorted({blob_id for _, blob_id in entries if blob_id not in cache})
+    texts = [
+        reader.read(blob_id).decode("utf-8", errors="replace") for blob_id in missing
+    ]
+    for blob_id, result in zip(missing, scan_texts(texts, patterns, jobs)):
+        cache[blob_id] = list(result)
+    return [FileStats(path, *cache[blob_id]) for path, blob_id in sorted(entries)]
+
+
+def backfill(
+    patterns: PatternMatcher,
+    since: date,
+    every: int,
+    jobs: int,
+    use_cache: bool = True,
+) -> Iterator[tuple[date, list[FileStats]]]:
+    """Yield (day, per-file results) for every `every` days from since to
+    today, scanning the last first-parent commit of HEAD on each day.
+
+    Days before the first commit are skipped.
+    """
+    cache = load_cache(patterns) if use_cache else {}
+    reader = BlobReader()
+    try:
+        day = since
+        while day <= date.today():
+            commit = git(
+                "rev-list", "-1", "--first-parent", f"--before={day} 23:59:59", "HEAD"
+            ).strip()
+            if commit:
+                yield day, scan_commit(commit, patterns, jobs, cache, reader)
+            day += timedelta(days=every)
+    finally:
+        reader.close()
+        if use_cache:
+            save_cache(patterns, cache)
@@ -21,8 +21,17 @@ Options:
     --wikis dota2,valorant   only these wikis (default: all dirs in lua/wikis,
                              commons included — it is a wiki like any other)
     --delay 2.0              seconds between API requests (be nice to prod)
+    --jobs 4                 crawl this many wikis concurrently (default: 1);
+                             rows are still written in wiki order
+    --max-rps 1.0            cap on API requests per second across all jobs
+    --retries 3              retries per request on connection errors and
+                             HTTP 429/5xx, honoring Retry-After
+    --backoff 1.0            exponential back-off factor between retries (s)
     --csv                    per-wiki summary CSV for time-series appending
-    --csv-pages              per-page CSV (wiki, title, lines, loc) instead
+    --csv-pages              per-page CSV (wiki, title, lines, loc) instead,
+                             by LOC descending within each wiki; a wiki's
+                             rows are only written once all of it is counted,
+                             so a failed wiki leaves no partial rows
     --no-header              omit the CSV header row (for appending)
     --pages / --no-pages     list on-wiki-only pages under each wiki in table
                              mode (default: --pages)
@@ -34,6 +43,16 @@ Options:
     --links-exact            exact counts via batched queries with full
                              pagination (implies --links; request count scales
                              with total links, not module count)
+    --links-hybrid           one batched request per 50 modules, plus per-module
+                             follow-up queries only for modules whose links
+                             did not fit in it (implies --links); exact counts
+    --links-cap N            stop following a module's links at N pages, for
+                             bounded cost on hot modules (implies
+                             --links-hybrid)
+    --cache-dir DIR          per-wiki cache of (revision id, lines, loc) per
+                             page; only pages edited since the last run are
+                             downloaded (default: cache/onwiki_loc)
+    --no-cache               download every page
 
 This is read-only and uses the public API; no login needed. Set a descriptive
 User-Agent below per API etiquette. If you'd rather not crawl the API, the
@@ -43,17 +62,32 @@ this script is the portable version.
 
 import argparse
 import csv
+import functools
+import json
+import queue
 import re
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 from pathlib import Path
+from typing import Iterator, Optional
+from urllib.parse import urlsplit
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from lua_lexer import LEXER_VERSION, count_loc
 
 REPO_ROOT = Path(__file__).resolve().parent.parent.parent
 WIKIS_DIR = REPO_ROOT / "lua" / "wikis"
 MODULE_NS = 828  # Scribunto Module namespace
+POOL_SIZE = 16  # keep-alive connections per host, shared by all --jobs threads
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+DEFAULT_CACHE_DIR = REPO_ROOT / "cache" / "onwiki_loc"
+LINK_BATCH_SIZE = 50  # pages handed to link counting at once
 
 HEADER = {
     "User-Agent": "LiquipediaMetrics/1.0 (standardization+phoenix tracking; engineering)",
@@ -72,6 +106,8 @@ EXCLUDE_RE = re.compile(
 )
 
 PAGE_HEADER_RE = re.compile(r"^--\s*page\s*=\s*(Module:.+?)\s*$", re.MULTILINE)
+# Characters read per repo file; the page header sits at the very top
+HEADER_READ_SIZE = 500
 
 
 def deployed_titles(wiki: str) -> dict[str, Path]:
@@ -85,26 +121,73 @@ def deployed_titles(wiki: str) -> dict[str, Path]:
     source_dir = WIKIS_DIR / wiki
     if source_dir.is_dir():
         for lua_file in source_dir.rglob("*.lua"):
-            head = lua_file.read_text(encoding="utf-8", errors="replace")[:500]
-            match = PAGE_HEADER_RE.search(head)
+            with lua_file.open(encoding="utf-8", errors="replace") as file:
+                match = PAGE_HEADER_RE.search(file.read(HEADER_READ_SIZE))
             if match:
                 titles[match.group(1)] = lua_file
     return titles
 
 
+class RequestThrottle:
+    """Spaces requests from all threads at least 1/max_rps seconds apart."""
+
+    def __init__(self, max_rps: float):
+        self.interval = 1 / max_rps
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        time.sleep(slot - now)
+
+
+# Shared by every crawl thread; set from --max-rps in main()
+throttle: Optional[RequestThrottle] = None
+# Set from --retries/--backoff in main(), before the first request
+retries = 3
+backoff = 1.0
+
+
+@functools.cache
+def http_session(host: str) -> requests.Session:
+    """Keep-alive session for one host, retrying transient failures."""
+    session = requests.Session()
+    session.headers.update(HEADER)
+    adapter = HTTPAdapter(
+        pool_maxsize=POOL_SIZE,
+        max_retries=Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=["GET"],
+            raise_on_status=False,
+        ),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
 def api_query(base_url: str, wiki: str, params: dict) -> dict:
-    response = requests.get(
+    if throttle is not None:
+        throttle.wait()
+    response = http_session(urlsplit(base_url).netloc).get(
         f"{base_url}/{wiki}/api.php",
         params={"format": "json", "formatversion": "2", **params},
-        headers=HEADER,
         timeout=60,
     )
     response.raise_for_status()
     return response.json()
 
 
-def fetch_modules(base_url: str, wiki: str, delay: float):
-    """Yield (title, content) for every Module-namespace page on the wiki."""
+def list_modules(base_url: str, wiki: str, delay: float) -> Iterator[dict]:
+    """Yield {pageid, title, lastrevid, ...} for every Module-namespace page.
+
+    Only page info is requested, so this is cheap regardless of module size.
+    """
     cont: dict = {}
     while True:
         data = api_query(
@@ -114,25 +197,117 @@ def fetch_modules(base_url: str, wiki: str, delay: float):
                 "action": "query",
                 "generator": "allpages",
                 "gapnamespace": str(MODULE_NS),
-                "gaplimit": "50",
-                "prop": "revisions",
-                "rvprop": "content",
-                "rvslots": "main",
+                "gaplimit": "max",
+                "prop": "info",
                 **cont,
             },
         )
-        for page in data.get("query", {}).get("pages", []):
-            revisions = page.get("revisions")
-            if not revisions:
-                continue
-            content = revisions[0].get("slots", {}).get("main", {}).get("content", "")
-            yield page["title"], content
+        yield from data.get("query", {}).get("pages", [])
         cont = data.get("continue")
         if not cont:
             return
         time.sleep(delay)
 
 
+def fetch_contents(
+    base_url: str, wiki: str, pageids: list[int], delay: float
+) -> Iterator[tuple[int, int, str]]:
+    """Yield (pageid, revid, content) of the current revision of each page."""
+    for start in range(0, len(pageids), 50):
+        chunk = pageids[start : start + 50]
+        cont: dict = {}
+        while True:
+            data = api_query(
+                base_url,
+                wiki,
+                {
+                    "action": "query",
+                    "pageids": "|".join(str(pageid) for pageid in chunk),
+                    "prop": "revisions",
+                    "rvprop": "ids|content",
+                    "rvslots": "main",
+                    **cont,
+                },
+            )
+            for page in data.get("query", {}).get("pages", []):
+                revisions = page.get("revisions")
+                if not revisions:
+                    continue
+                content = (
+                    revisions[0].get("slots", {}).get("main", {}).get("content", "")
+                )
+                yield page["pageid"], revisions[0]["revid"], content
+            cont = data.get("continue")
+            if not cont:
+                break
+            time.sleep(delay)
+        time.sleep(delay)
+
+
+def load_cache(cache_file: Optional[Path]) -> dict[str, dict]:
+    """Return the page cache, pageid (as str) -> {revid, lines, loc}.
+
+    Caches written under other LOC rules are discarded, and so are malformed
+    entries, which makes their pages stale.
+    """
+    if cache_file is None:
+        return {}
+    try:
+        cache = json.loads(cache_file.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("version") != LEXER_VERSION:
+        return {}
+    pages = cache.get("pages")
+    if not isinstance(pages, dict):
+        return {}
+    return {
+        pageid: entry
+        for pageid, entry in pages.items()
+        if isinstance(entry, dict)
+        and all(isinstance(entry.get(key), int) for key in ("revid", "lines", "loc"))
+    }
+
+
+def save_cache(cache_file: Optional[Path], cache: dict[str, dict]) -> None:
+    if cache_file is None:
+        return
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    cache_file.write_text(
+        json.dumps({"version": LEXER_VERSION, "pages": cache}), encoding="utf-8"
+    )
+
+
+def count_modules(
+    base_url: str,
+    wiki: str,
+    pages: list[dict],
+    delay: float,
+    cache_file: Optional[Path],
+) -> Iterator[tuple[str, int, int]]:
+    """Yield (title, lines, loc) for the listed pages.
+
+    Pages whose current revision is in the cache are not downloaded. The
+    cache is rewritten with exactly the listed pages, so deleted and
+    excluded pages drop out of it.
+    """
+    cache = load_cache(cache_file)
+    fresh: dict[str, dict] = {}
+    stale: dict[int, str] = {}
+    for page in pages:
+        entry = cache.get(str(page["pageid"]))
+        if entry is not None and entry["revid"] == page.get("lastrevid"):
+            fresh[str(page["pageid"])] = entry
+            yield page["title"], entry["lines"], entry["loc"]
+        else:
+            stale[page["pageid"]] = page["title"]
+    for pageid, revid, content in fetch_contents(base_url, wiki, list(stale), delay):
+        lines, loc = count_loc(content)
+        fresh[str(pageid)] = {"revid": revid, "lines": lines, "loc": loc}
+        yield stale[pageid], lines, loc
+    save_cache(cache_file, fresh)
+
+
 def resolve_link_namespaces(base_url: str, wiki: str) -> list[int]:
     """Namespace ids that count as real usage: main, Project, Portal."""
     data = api_query(
@@ -156,53 +331,116 @@ def resolve_link_namespaces(base_url: str, wiki: str) -> list[int]:
     return wanted
 
 
+def parse_backlinks_continue(value: str) -> Optional[tuple[int, str]]:
+    """Target (namespace, db key) a batched linkshere/transcludedin
+    continuation resumes at, or None if it does not name one.
+
+    Batched backlink props are sorted by target, so targets before this
+    position are complete and it and later targets are not.
+    """
+    parts = value.split("|")
+    if len(parts) < 3 or not parts[0].lstrip("-").isdigit():
+        return None
+    return int(parts[0]), parts[1]
+
+
+def title_key(page: dict) -> tuple[int, str]:
+    """(namespace, db key) of a page, as sorted by the API."""
+    title = page["title"]
+    if page.get("ns", 0) != 0:
+        title = title.split(":", 1)[1]
+    return page.get("ns", 0), title.replace(" ", "_")
+
+
+def count_title_links(
+    base_url: str,
+    wiki: str,
+    title: str,
+    ns_filter: str,
+    delay: float,
+    links: set[int],
+    cap: Optional[int] = None,
+    follow: bool = True,
+) -> None:
+    """Add the ids of pages linking to or transcluding title to links.
+
+    Continuation is followed until exhausted or cap pages are known; without
+    follow only the first 500 per link type are read.
+    """
+    cont: dict = {}
+    while True:
+        data = api_query(
+            base_url,
+            wiki,
+            {
+                "action": "query",
+                "list": "embeddedin|backlinks",
+                "eititle": title,
+                "bltitle": title,
+                "einamespace": ns_filter,
+                "blnamespace": ns_filter,
+                "eilimit": "500",
+                "bllimit": "500",
+                **cont,
+            },
+        )
+        for list_module in ("embeddedin", "backlinks"):
+            for entry in data.get("query", {}).get(list_module, []):
+                links.add(entry["pageid"])
+        cont = data.get("continue")
+        if not follow or not cont or (cap is not None and len(links) >= cap):
+            return
+        time.sleep(delay)
+
+
 def count_what_links_here(
     base_url: str,
     wiki: str,
     titles: list[str],
     ns_ids: list[int],
     delay: float,
-    exhaustive: bool,
+    mode: str,
+    cap: Optional[int] = None,
 ) -> dict[str, int]:
     """WhatLinksHere counts per title, restricted to the given namespaces:
     distinct pages linking to or transcluding/#invoke-ing each title.
 
-    Default mode: one request per title (list=embeddedin|backlinks combined),
-    counts exact up to 500 per link type, capped above that. Per-title queries
-    are required for a trustworthy cap: batched prop queries share one result
-    limit sequentially across the batch, so one heavy module starves the rest.
+    "capped" mode (default): one request per title (list=embeddedin|backlinks
+    combined), counts exact up to 500 per link type, capped above that.
+    Per-title queries are required for a trustworthy cap: batched prop
+    queries share one result limit sequentially across the batch, so one
+    heavy module starves the rest.
 
-    Exhaustive mode (--links-exact): batched prop=linkshere|transcludedin,
+    "exact" mode (--links-exact): batched prop=linkshere|transcludedin,
     50 titles per request, continuation followed to the end. Exact counts;
     request count scales with total links rather than title count, so this is
     often FASTER than default on lightly-linked wikis but unbounded on
     heavily-used modules.
+
+    "hybrid" mode (--links-hybrid): one batched request per 50 titles without
+    continuation, which completes the long tail of lightly-linked titles.
+    Only titles the continuation shows as cut off get per-title queries,
+    followed until exhausted or, with a cap, until cap pages are known.
+    Counts are exact, or clamped to cap when one is given.
     """
     ns_filter = "|".join(str(ns) for ns in ns_ids)
     linking_pages: dict[str, set[int]] = {title: set() for title in titles}
 
-    if not exhaustive:
+    if mode == "capped":
         for title in titles:
-            data = api_query(
+            count_title_links(
                 base_url,
                 wiki,
-                {
-                    "action": "query",
-                    "list": "embeddedin|backlinks",
-                    "eititle": title,
-                    "bltitle": title,
-                    "einamespace": ns_filter,
-                    "blnamespace": ns_filter,
-                    "eilimit": "500",
-                    "bllimit": "500",
-                },
+                title,
+                ns_filter,
+                delay,
+                linking_pages[title],
+                follow=False,
             )
-            for list_module in ("embeddedin", "backlinks"):
-                for entry in data.get("query", {}).get(list_module, []):
-                    linking_pages[title].add(entry["pageid"])
             time.sleep(delay)
         return {title: len(pages) for title, pages in linking_pages.items()}
 
+    pending: list[str] = []
     for start in range(0, len(titles), 50):
         chunk = titles[start : start + 50]
         cont: dict = {}
@@ -223,30 +461,121 @@ def count_what_links_here(
                     **cont,
                 },
             )
+            keys: dict[str, tuple[int, str]] = {}
             for page in data.get("query", {}).get("pages", []):
                 links = linking_pages.get(page.get("title"))
                 if links is None:
                     continue
+                keys[page["title"]] = title_key(page)
                 for entry in page.get("linkshere", []) + page.get("transcludedin", []):
                     links.add(entry["pageid"])
             cont = data.get("continue")
             if not cont:
                 break
+            if mode == "hybrid":
+                positions = [
+                    parse_backlinks_continue(cont[param])
+                    for param in ("lhcontinue", "ticontinue")
+                    if param in cont
+                ]
+                pending.extend(
+                    title
+                    for title in chunk
+                    if any(
+                        position is None or title not in keys or keys[title] >= position
+                        for position in positions
+                    )
+                )
+                break
             time.sleep(delay)
         time.sleep(delay)
-    return {title: len(pages) for title, pages in linking_pages.items()}
 
+    for title in pending:
+        count_title_links(
+            base_url, wiki, title, ns_filter, delay, linking_pages[title], cap
+        )
+        time.sleep(delay)
+    return {
+        title: len(pages) if cap is None else min(len(pages), cap)
+        for title, pages in linking_pages.items()
+    }
+
+
+def stream_pages(
+    base_url: str,
+    wiki: str,
+    pages: list[dict],
+    delay: float,
+    cache_file: Optional[Path],
+    ns_ids: Optional[list[int]],
+    links_mode: str,
+    links_cap: Optional[int] = None,
+) -> Iterator[tuple]:
+    """Yield (title, lines, loc) per page as soon as it is counted, plus a
+    WhatLinksHere count when ns_ids is given.
+
+    Page contents are reduced to counts as they arrive. With links, a
+    background thread keeps downloading contents while links are counted
+    for every finished batch of LINK_BATCH_SIZE pages; it stops after its
+    current page once this generator fails or is closed.
+    """
+    rows = count_modules(base_url, wiki, pages, delay, cache_file)
+    if ns_ids is None:
+        yield from rows
+        return
 
-def count_loc(content: str) -> tuple[int, int]:
-    lines = content.splitlines()
-    loc = sum(1 for line in lines if line.strip() and not line.strip().startswith("--"))
-    return len(lines), loc
+    counted: queue.Queue = queue.Queue()
+    stop = threading.Event()
+
+    def produce() -> None:
+        try:
+            for row in rows:
+                if stop.is_set():
+                    break
+                counted.put(row)
+        except Exception as error:
+            counted.put(error)
+        counted.put(None)
+
+    threading.Thread(target=produce, daemon=True).start()
+    batch: list[tuple[str, int, int]] = []
+    done = False
+    try:
+        while not done:
+            row = counted.get()
+            if isinstance(row, Exception):
+                raise row
+            done = row is None
+            if not done:
+                batch.append(row)
+            if batch and (done or len(batch) == LINK_BATCH_SIZE):
+                link_counts = count_what_links_here(
+                    base_url,
+                    wiki,
+                    [title for title, _, _ in batch],
+                    ns_ids,
+                    delay,
+                    links_mode,
+                    links_cap,
+                )
+                for title, lines, loc in batch:
+                    yield title, lines, loc, link_counts[title]
+                batch = []
+    finally:
+        # Don't keep downloading pages nobody will count links for
+        stop.set()
 
 
 def analyze_wiki(
-    base_url: str, wiki: str, delay: float, check_links: bool, links_exact: bool
+    base_url: str,
+    wiki: str,
+    delay: float,
+    check_links: bool,
+    links_mode: str,
+    cache_dir: Optional[Path] = None,
+    links_cap: Optional[int] = None,
 ) -> tuple[dict, list]:
-    """Return (summary stats, list of on-wiki-only pages).
+    """Return (summary stats, list of on-wiki-only pages, by LOC descending).
 
     Pages are (title, lines, loc) tuples, plus a WhatLinksHere count
     (main/Project/Portal namespaces only) when check_links is set.
@@ -260,31 +589,40 @@ def analyze_wiki(
         "onwiki_loc": 0,
         "excluded_pages": 0,
     }
-    pages: list[tuple[str, int, int]] = []
-    for title, content in fetch_modules(base_url, wiki, delay):
-        if EXCLUDE_RE.search(title):
+    to_count: list[dict] = []
+    for page in list_modules(base_url, wiki, delay):
+        if EXCLUDE_RE.search(page["title"]):
             stats["excluded_pages"] += 1
             continue
-        if title in deployed:
+        if page["title"] in deployed:
             continue
-        lines, loc = count_loc(content)
+        to_count.append(page)
+    cache_file = cache_dir / f"{wiki}.json" if cache_dir else None
+    ns_ids = resolve_link_namespaces(base_url, wiki) if check_links else None
+    pages: list[tuple] = []
+    for page in stream_pages(
+        base_url, wiki, to_count, delay, cache_file, ns_ids, links_mode, links_cap
+    ):
         stats["onwiki_pages"] += 1
-        stats["onwiki_lines"] += lines
-        stats["onwiki_loc"] += loc
-        pages.append((title, lines, loc))
+        stats["onwiki_lines"] += page[1]
+        stats["onwiki_loc"] += page[2]
+        pages.append(page)
     pages.sort(key=lambda page: page[2], reverse=True)
-    if check_links:
-        ns_ids = resolve_link_namespaces(base_url, wiki)
-        link_counts = count_what_links_here(
-            base_url, wiki, [title for title, _, _ in pages], ns_ids, delay, links_exact
-        )
-        pages = [(title, lines, loc, link_counts[title]) for title, lines, loc in pages]
     return stats, pages
 
 
+def positive_float(value: str) -> float:
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0: {value}")
+    return number
+
+
 def main() -> None:
     import os
 
+    global throttle, retries, backoff
+
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument(
         "--base-url", default=os.getenv("WIKI_BASE_URL", "https://liquipedia.net")
@@ -293,9 +631,32 @@ def main() -> None:
         "--wikis", help="comma-separated wiki list (default: all dirs in lua/wikis)"
     )
     parser.add_argument("--delay", type=float, default=2.0)
+    parser.add_argument(
+        "--jobs", type=int, default=1, help="number of wikis to crawl concurrently"
+    )
+    parser.add_argument(
+        "--max-rps",
+        type=positive_float,
+        default=1.0,
+        help="cap on API requests per second across all jobs",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help="retries per request on connection errors and HTTP 429/5xx",
+    )
+    parser.add_argument(
+        "--backoff",
+        type=float,
+        default=1.0,
+        help="exponential back-off factor between retries, in seconds",
+    )
     parser.add_argument("--csv", action="store_true", help="per-wiki summary CSV")
     parser.add_argument(
-        "--csv-pages", action="store_true", help="per-page CSV instead of summary"
+        "--csv-pages",
+        action="store_true",
+        help="per-page CSV instead of summary, written per wiki once it is complete",
     )
     parser.add_argument(
         "--pages",
@@ -316,6 +677,32 @@ def main() -> None:
         help="follow pagination for exact WhatLinksHere counts "
         "(slower; implies --links)",
     )
+    parser.add_argument(
+        "--links-hybrid",
+        action="store_true",
+        help="batched counts, with per-title follow-up queries only for "
+        "titles with more links than one batch returns (implies --links)",
+    )
+    parser.add_argument(
+        "--links-cap",
+        type=int,
+        help="stop counting a title's links at this many pages "
+        "(implies --links-hybrid)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=DEFAULT_CACHE_DIR,
+        help="per-wiki page cache; only pages edited since the last run are "
+        "downloaded (default: cache/onwiki_loc)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        dest="cache_dir",
+        action="store_const",
+        const=None,
+        help="download every page",
+    )
     parser.add_argument(
         "--header",
         action=argparse.BooleanOptionalAction,
@@ -324,8 +711,13 @@ def main() -> None:
         "to an existing time-series file)",
     )
     args = parser.parse_args()
-    if args.links_exact:
+    if args.links_cap is not None:
+        args.links_hybrid = True
+    if args.links_exact or args.links_hybrid:
         args.links = True
+    links_mode = (
+        "hybrid" if args.links_hybrid else "exact" if args.links_exact else "capped"
+    )
 
     if args.wikis:
         wikis = [w.strip() for w in args.wikis.split(",") if w.strip()]
@@ -357,35 +749,55 @@ def main() -> None:
     else:
         print(f"{'wiki':<20} {'pages':>6} {'lines':>9} {'loc':>9}")
 
-    totals = dict.fromkeys(fieldnames[2:], 0)
-    for wiki in wikis:
+    throttle = RequestThrottle(args.max_rps)
+    retries, backoff = args.retries, args.backoff
+
+    def crawl(wiki: str):
         try:
-            stats, pages = analyze_wiki(
-                args.base_url, wiki, args.delay, args.links, args.links_exact
+            return analyze_wiki(
+                args.base_url,
+                wiki,
+                args.delay,
+                args.links,
+                links_mode,
+                args.cache_dir,
+                args.links_cap,
             )
         except Exception as error:  # keep going; one broken wiki shouldn't kill the run
-            print(f"ERROR {wiki}: {error}", file=sys.stderr)
-            continue
-        for key in totals:
-            totals[key] += stats[key]
-        if args.csv_pages:
-            for page in pages:
-                writer.writerow([stats["date"], wiki, *page])
-            sys.stdout.flush()
-        elif args.csv:
-            writer.writerow(stats)
-            sys.stdout.flush()
-        else:
-            print(
-                f"{stats['wiki']:<20} {stats['onwiki_pages']:>6} {stats['onwiki_lines']:>9} "
-                f"{stats['onwiki_loc']:>9}"
-            )
-            if args.pages:
+            return error
+        finally:
+            time.sleep(args.delay)
+
+    totals = dict.fromkeys(fieldnames[2:], 0)
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        futures = [executor.submit(crawl, wiki) for wiki in wikis]
+        # Results are taken in wiki order, so output is stable for any --jobs
+        for wiki, future in zip(wikis, futures):
+            result = future.result()
+            if isinstance(result, Exception):
+                print(f"ERROR {wiki}: {result}", file=sys.stderr)
+                continue
+            stats, pages = result
+            for key in totals:
+                totals[key] += stats[key]
+            if args.csv_pages:
+                # Only complete wikis reach the time series
                 for page in pages:
-                    title, lines, loc = page[:3]
-                    suffix = f", {page[3]} usages" if args.links else ""
-                    print(f"    {title}  ({loc} loc{suffix})")
-        time.sleep(args.delay)
+                    writer.writerow([stats["date"], wiki, *page])
+                sys.stdout.flush()
+            elif args.csv:
+                writer.writerow(stats)
+                sys.stdout.flush()
+            else:
+                print(
+                    f"{stats['wiki']:<20} {stats['onwiki_pages']:>6} {stats['onwiki_lines']:>9} "
+                    f"{stats['onwiki_loc']:>9}"
+                )
+                if args.pages:
+                    for page in pages:
+                        title, lines, loc = page[:3]
+                        suffix = f", {page[3]} usages" if args.links else ""
+                        print(f"    {title}  ({loc} loc{suffix})")
 
     if not args.csv and not args.csv_pages:
         print("-" * 47)
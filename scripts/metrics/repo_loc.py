@@ -2,11 +2,18 @@
 """Metric 1: repo Lua LOC per wiki.
 
 Counts lines of repo-managed Lua code per wiki directory (lua/wikis/<wiki>),
-with commons listed separately. LOC = non-blank, non-comment-only lines;
-total physical lines and file counts are also reported.
+with commons listed separately. LOC = lines holding code or string literals
+(blank lines and lines that are only comment, block comments included, do not
+count); total physical lines and file counts are also reported.
 
 Usage:
-    python3 scripts/metrics/repo_loc.py [--csv] [--no-header]
+    python3 scripts/metrics/repo_loc.py [--csv] [--no-header] [--jobs N]
+        [--no-cache] [--since YYYY-MM-DD [--every DAYS]]
+
+--since backfills the time series: one row set per --every days (default 7)
+from that date to today, computed from the last commit of each day. Files
+are read from the git object store, so nothing is checked out, and each
+distinct file version is scanned only once.
 
 Intended to be run on a schedule (e.g. weekly CI job) with --csv appended to a
 time-series file, so standardization / Phoenix progress can be charted.
@@ -15,41 +22,76 @@ time-series file, so standardization / Phoenix progress can be charted.
 import argparse
 import csv
 import sys
+from collections import defaultdict
 from datetime import date
 from pathlib import Path
 
-REPO_ROOT = Path(__file__).resolve().parent.parent.parent
-WIKIS_DIR = REPO_ROOT / "lua" / "wikis"
+from deprecated_patterns import COMPILED
+from lua_scan import (
+    DEFAULT_JOBS,
+    WIKIS_DIR,
+    FileStats,
+    backfill,
+    compile_patterns,
+    read_lua,
+    scan_text,
+    scan_tree,
+)
+
+CSV_FIELDS = ["date", "wiki", "files", "lines", "loc"]
 
 
 def count_file(path: Path) -> tuple[int, int]:
     """Return (physical_lines, loc) for a Lua file."""
-    lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
-    loc = sum(1 for line in lines if line.strip() and not line.strip().startswith("--"))
-    return len(lines), loc
+    physical, loc, _ = scan_text(read_lua(path), compile_patterns({}))
+    return physical, loc
+
+
+def summarize(files: list[FileStats], day: str, wikis: list[str]) -> list[dict]:
+    by_wiki = defaultdict(list)
+    for file_stats in files:
+        by_wiki[file_stats.path.relative_to(WIKIS_DIR).parts[0]].append(file_stats)
+    return [
+        {
+            "date": day,
+            "wiki": wiki,
+            "files": len(by_wiki[wiki]),
+            "lines": sum(f.lines for f in by_wiki[wiki]),
+            "loc": sum(f.loc for f in by_wiki[wiki]),
+        }
+        for wiki in wikis
+    ]
+
+
+def current_rows(files: list[FileStats]) -> list[dict]:
+    """Rows for a scan of the working tree, one per wiki directory."""
+    return summarize(
+        files,
+        date.today().isoformat(),
+        sorted(d.name for d in WIKIS_DIR.iterdir() if d.is_dir()),
+    )
+
+
+def history_rows(day: date, files: list[FileStats]) -> list[dict]:
+    """Rows for a scan of a past commit, one per wiki it had files for."""
+    wikis = sorted({f.path.relative_to(WIKIS_DIR).parts[0] for f in files})
+    return summarize(files, day.isoformat(), wikis)
+
+
+def collect(jobs: int = 1, use_cache: bool = True) -> list[dict]:
+    # Scanning with the deprecated patterns costs little on top of the LOC
+    # count and lets this script and deprecated_patterns.py share cached
+    # results; repo_metrics.py reports both from one scan
+    return current_rows(scan_tree(COMPILED, jobs, use_cache))
 
 
-def collect() -> list[dict]:
+def collect_history(
+    since: date, every: int, jobs: int = 1, use_cache: bool = True
+) -> list[dict]:
+    """Rows for every `every` days since `since`, read from git history."""
     rows = []
-    for wiki_dir in sorted(WIKIS_DIR.iterdir()):
-        if not wiki_dir.is_dir():
-            continue
-        files = list(wiki_dir.rglob("*.lua"))
-        total_lines = 0
-        total_loc = 0
-        for f in files:
-            physical, loc = count_file(f)
-            total_lines += physical
-            total_loc += loc
-        rows.append(
-            {
-                "date": date.today().isoformat(),
-                "wiki": wiki_dir.name,
-                "files": len(files),
-                "lines": total_lines,
-                "loc": total_loc,
-            }
-        )
+    for day, files in backfill(COMPILED, since, every, jobs, use_cache):
+        rows.extend(history_rows(day, files))
     return rows
 
 
@@ -58,6 +100,31 @@ def main() -> None:
     parser.add_argument(
         "--csv", action="store_true", help="CSV output (for appending to a time series)"
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=DEFAULT_JOBS,
+        help="number of processes scanning files (default: one per CPU, at most 8)",
+    )
+    parser.add_argument(
+        "--cache",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="reuse results for files unchanged since an earlier run "
+        "(keyed by git blob, stored in cache/lua_scan.json)",
+    )
+    parser.add_argument(
+        "--since",
+        type=date.fromisoformat,
+        help="backfill: one data point every --every days from this date "
+        "(YYYY-MM-DD) to today, read from git history (requires --csv)",
+    )
+    parser.add_argument(
+        "--every",
+        type=int,
+        default=7,
+        help="days between backfilled data points (default: 7)",
+    )
     parser.add_argument(
         "--header",
         action=argparse.BooleanOptionalAction,
@@ -66,12 +133,17 @@ def main() -> None:
         "to an existing time-series file)",
     )
     args = parser.parse_args()
+    if args.since and not args.csv:
+        parser.error("--since requires --csv")
+    if args.every < 1:
+        parser.error("--every must be at least 1")
 
-    rows = collect()
+    if args.since:
+        rows = collect_history(args.since, args.every, args.jobs, args.cache)
+    else:
+        rows = collect(args.jobs, args.cache)
     if args.csv:
-        writer = csv.DictWriter(
-            sys.stdout, fieldnames=["date", "wiki", "files", "lines", "loc"]
-        )
+        writer = csv.DictWriter(sys.stdout, fieldnames=CSV_FIELDS)
         if args.header:
             writer.writeheader()
         writer.writerows(rows)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Metrics 1 and 3 from a single scan: repo Lua LOC per wiki and deprecated
+pattern usage.
+
+Appends the rows repo_loc.py --csv and deprecated_patterns.py --csv would
+print to one time-series file each, scanning lua/wikis (or, with --since,
+git history) only once instead of once per script.
+
+Usage:
+    python3 scripts/metrics/repo_metrics.py --loc-csv FILE --patterns-csv FILE
+        [--no-header] [--jobs N] [--no-cache] [--since YYYY-MM-DD [--every DAYS]]
+"""
+
+import argparse
+import csv
+from datetime import date
+from pathlib import Path
+
+import repo_loc
+from deprecated_patterns import COMPILED, PATTERNS, tally
+from lua_scan import DEFAULT_JOBS, backfill, scan_tree
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--loc-csv", type=Path, required=True, help="file to append LOC rows to"
+    )
+    parser.add_argument(
+        "--patterns-csv",
+        type=Path,
+        required=True,
+        help="file to append deprecated pattern rows to",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=DEFAULT_JOBS,
+        help="number of processes scanning files (default: one per CPU, at most 8)",
+    )
+    parser.add_argument(
+        "--cache",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="reuse results for files unchanged since an earlier run "
+        "(keyed by git blob, stored in cache/lua_scan.json)",
+    )
+    parser.add_argument(
+        "--since",
+        type=date.fromisoformat,
+        help="backfill: one data point every --every days from this date "
+        "(YYYY-MM-DD) to today, read from git history",
+    )
+    parser.add_argument(
+        "--every",
+        type=int,
+        default=7,
+        help="days between backfilled data points (default: 7)",
+    )
+    parser.add_argument(
+        "--header",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="write the CSV header rows (--no-header when appending "
+        "to existing time-series files)",
+    )
+    args = parser.parse_args()
+    if args.every < 1:
+        parser.error("--every must be at least 1")
+
+    with (
+        args.loc_csv.open("a", newline="") as loc_file,
+        args.patterns_csv.open("a", newline="") as patterns_file,
+    ):
+        loc_writer = csv.DictWriter(loc_file, fieldnames=repo_loc.CSV_FIELDS)
+        patterns_writer = csv.DictWriter(patterns_file, fieldnames=["date", *PATTERNS])
+        if args.header:
+            loc_writer.writeheader()
+            patterns_writer.writeheader()
+        if args.since:
+            for day, files in backfill(
+                COMPILED, args.since, args.every, args.jobs, args.cache
+            ):
+                loc_writer.writerows(repo_loc.history_rows(day, files))
+                patterns_writer.writerow({"date": day.isoformat(), **tally(files)[0]})
+        else:
+            files = scan_tree(COMPILED, args.jobs, args.cache)
+            loc_writer.writerows(repo_loc.current_rows(files))
+            patterns_writer.writerow(
+                {"date": date.today().isoformat(), **tally(files)[0]}
+            )
+
+
+if __name__ == "__main__":
+    main()
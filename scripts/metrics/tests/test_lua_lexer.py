@@ -0,0 +1,40 @@
+import unittest
+
+from lua_lexer import code_only, count_loc
+
+
+class CodeOnlyTest(unittest.TestCase):
+    def test_removes_line_comments(self):
+        self.assertEqual(code_only("local a = 1 -- note\n"), "local a = 1 \n")
+
+    def test_removes_block_comments_keeping_lines(self):
+        self.assertEqual(code_only("--[==[ a\n]] b\n]==]x"), "\n\nx")
+
+    def test_masks_strings(self):
+        self.assertEqual(code_only('f(\'--\', "a\\"b")'), 'f("", "")')
+
+    def test_masks_long_strings_per_line(self):
+        self.assertEqual(code_only("x = [[a\nb]]"), 'x = ""\n""')
+
+    def test_quotes_inside_comments(self):
+        self.assertEqual(code_only("-- it's\nx"), "\nx")
+
+    def test_unterminated_string_ends_at_line_break(self):
+        self.assertEqual(code_only("x = 'a\ny"), 'x = ""\ny')
+
+
+class CountLocTest(unittest.TestCase):
+    def test_counts(self):
+        source = "local a = 1\n\n-- comment\n--[[\nblock\n]]\nreturn [[\n\n]]\n"
+        self.assertEqual(count_loc(source), (9, 4))
+
+    def test_reuses_masked_code(self):
+        source = "x = 1 -- note\n-- only\n"
+        self.assertEqual(count_loc(source, code_only(source)), count_loc(source))
+
+    def test_empty(self):
+        self.assertEqual(count_loc(""), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+from lua_scan import compile_patterns, scan_text
+
+
+class PatternMatcherTest(unittest.TestCase):
+    def test_counts_every_pattern_in_one_pass(self):
+        matcher = compile_patterns(
+            {
+                "require": [r"\brequire\b", r"\bLua\.import\b"],
+                "mw.text": [r"\bmw\.text\."],
+            }
+        )
+        counts = matcher.count("require('a')\nLua.import('b')\nmw.text.split(x)\n")
+        self.assertEqual(counts, {"require": 2, "mw.text": 1})
+
+    def test_unmatched_patterns_count_zero(self):
+        matcher = compile_patterns({"require": [r"\brequire\b"], "unused": ["xyz"]})
+        self.assertEqual(matcher.count("require()"), {"require": 1, "unused": 0})
+
+    def test_no_patterns(self):
+        matcher = compile_patterns({})
+        self.assertIsNone(matcher.regex)
+        self.assertEqual(matcher.count("require()"), {})
+
+    def test_signature_follows_patterns(self):
+        signature = compile_patterns({"a": ["a"]}).signature
+        self.assertEqual(compile_patterns({"a": ["a"]}).signature, signature)
+        self.assertNotEqual(compile_patterns({"a": ["b"]}).signature, signature)
+        self.assertNotEqual(compile_patterns({"b": ["a"]}).signature, signature)
+
+
+class ScanTextTest(unittest.TestCase):
+    def test_patterns_only_count_in_code(self):
+        matcher = compile_patterns({"require": [r"\brequire\b"]})
+        source = "-- require\nlocal a = require('x') -- require\nlocal b = 'require'\n"
+        self.assertEqual(scan_text(source, matcher), (3, 2, {"require": 1}))
+
+
+if __name__ == "__main__":
+    unittest.main()
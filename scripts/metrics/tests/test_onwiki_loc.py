@@ -0,0 +1,29 @@
+import unittest
+
+from onwiki_loc import parse_backlinks_continue, title_key
+
+
+class ParseBacklinksContinueTest(unittest.TestCase):
+    def test_target_position(self):
+        self.assertEqual(
+            parse_backlinks_continue("828|Foo/Bar|12345"), (828, "Foo/Bar")
+        )
+
+    def test_main_namespace(self):
+        self.assertEqual(parse_backlinks_continue("0|Main_Page|1"), (0, "Main_Page"))
+
+    def test_negative_namespace(self):
+        self.assertEqual(parse_backlinks_continue("-1|Foo|1"), (-1, "Foo"))
+
+    def test_unrecognized(self):
+        for value in ("", "12345", "828|Foo", "Foo|Bar|1"):
+            with self.subTest(value=value):
+                self.assertIsNone(parse_backlinks_continue(value))
+
+    def test_matches_title_key(self):
+        page = {"ns": 828, "title": "Module:Foo bar"}
+        self.assertEqual(parse_backlinks_continue("828|Foo_bar|7"), title_key(page))
+
+
+if __name__ == "__main__":
+    unittest.main()
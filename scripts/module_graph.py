@@ -0,0 +1,261 @@
+import argparse
+import hashlib
+import json
+import os
+import pathlib
+import re
+import subprocess
+
+from collections import defaultdict
+from typing import Iterable, NamedTuple, Optional
+
+from deploy_util import CACHE_DIR
+from header_index import HEADER_PATTERN
+
+__all__ = [
+    "COMMONS",
+    "ModuleGraph",
+    "ModuleInfo",
+    "load_module_graph",
+]
+
+COMMONS = "commons"
+LUA_WIKIS_DIR = pathlib.Path("./lua/wikis/")
+MODULE_GRAPH_CACHE_FILE = pathlib.Path(
+    os.getenv("MODULE_GRAPH_CACHE_FILE") or CACHE_DIR / "module_graph.json"
+)
+# Bump whenever the parsing rules change, to invalidate cached entries
+MODULE_GRAPH_VERSION = 1
+
+IMPORT_PATTERN = re.compile(
+    r"(?:\brequire|\bLua\.import|\bLua\.requireIfExists|\bmw\.loadData)"
+    r"\s*\(?\s*(?P<quote>['\"])(?P<module>Module:[^'\"\n]+)(?P=quote)"
+)
+
+
+class ModuleInfo(NamedTuple):
+    path: pathlib.Path
+    page: Optional[str]
+    imports: frozenset[str]
+
+    @property
+    def wiki(self) -> str:
+        return self.path.parts[2]
+
+
+def parse_module(path: pathlib.Path, content: str) -> ModuleInfo:
+    header_match = HEADER_PATTERN.match(content)
+    return ModuleInfo(
+        path,
+        header_match.group("pageName") if header_match else None,
+        frozenset(match.group("module") for match in IMPORT_PATTERN.finditer(content)),
+    )
+
+
+def git_blob_id(data: bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def _tracked_blob_ids() -> dict[pathlib.Path, str]:
+    """Git blob ids of the files under lua/wikis that are unmodified in the
+    working tree; modified and untracked files are hashed when read."""
+    try:
+        staged = subprocess.check_output(
+            ["git", "ls-files", "-s", "-z", "--", str(LUA_WIKIS_DIR)]
+        ).decode()
+        modified = subprocess.check_output(
+            ["git", "ls-files", "-m", "-z", "--", str(LUA_WIKIS_DIR)]
+        ).decode()
+    except (OSError, subprocess.CalledProcessError):
+        return dict()
+    modified_paths = {pathlib.Path(path) for path in modified.split("\0") if path}
+    blob_ids: dict[pathlib.Path, str] = dict()
+    for entry in staged.split("\0"):
+        if not entry:
+            continue
+        info, path = entry.split("\t", 1)
+        if pathlib.Path(path) not in modified_paths:
+            blob_ids[pathlib.Path(path)] = info.split()[1]
+    return blob_ids
+
+
+def _read_cache() -> dict[str, dict]:
+    try:
+        with MODULE_GRAPH_CACHE_FILE.open("r") as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        return dict()
+    if cache.get("version") != MODULE_GRAPH_VERSION:
+        return dict()
+    return cache["blobs"]
+
+
+def _write_cache(blobs: dict[str, dict]):
+    MODULE_GRAPH_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with MODULE_GRAPH_CACHE_FILE.open("w") as cache_file:
+        json.dump({"version": MODULE_GRAPH_VERSION, "blobs": blobs}, cache_file)
+
+
+class ModuleGraph:
+    """Import graph of all modules in lua/wikis, as resolved on each wiki.
+
+    On a wiki, a page is provided by that wiki's own file if it has one,
+    which shadows the commons file of the same page, and by the commons
+    file otherwise.
+    """
+
+    __modules: dict[pathlib.Path, ModuleInfo]
+    __pages: dict[str, dict[str, ModuleInfo]]
+
+    def __init__(self, modules: Iterable[ModuleInfo]):
+        self.__modules = dict()
+        self.__pages = defaultdict(dict)
+        for module in modules:
+            self.__modules[module.path] = module
+            if module.page is not None:
+                self.__pages[module.wiki][module.page] = module
+
+    @property
+    def wikis(self) -> list[str]:
+        return sorted(self.__pages)
+
+    def module(self, path: pathlib.Path) -> Optional[ModuleInfo]:
+        return self.__modules.get(pathlib.Path(path))
+
+    def resolve(self, wiki: str, page: str) -> Optional[ModuleInfo]:
+        """The module providing page on wiki, if it comes from this repo."""
+        return self.__pages[wiki].get(page) or self.__pages[COMMONS].get(page)
+
+    def visible_modules(self, wiki: str) -> dict[str, ModuleInfo]:
+        """Page -> providing module, for every repo page available on wiki."""
+        return {**self.__pages[COMMONS], **self.__pages[wiki]}
+
+    def shadows(self, page: str) -> list[ModuleInfo]:
+        """Per-wiki overrides of a commons page."""
+        return [
+            self.__pages[wiki][page]
+            for wiki in self.wikis
+            if wiki != COMMONS and page in self.__pages[wiki]
+        ]
+
+    def dependents(self, wiki: str, pages: Iterable[str]) -> dict[str, ModuleInfo]:
+        """Pages on wiki that are among pages or import one of them, directly
+        or through other modules, mapped to their providing module."""
+        importers: dict[str, set[str]] = defaultdict(set)
+        visible = self.visible_modules(wiki)
+        for page, module in visible.items():
+            for imported in module.imports:
+                importers[imported].add(page)
+        found: set[str] = set()
+        pending = [page for page in pages if page in visible]
+        while pending:
+            page = pending.pop()
+            if page in found:
+                continue
+            found.add(page)
+            pending.extend(importers[page] - found)
+        return {page: visible[page] for page in sorted(found)}
+
+    def affected(
+        self, paths: Iterable[pathlib.Path]
+    ) -> dict[str, dict[str, ModuleInfo]]:
+        """Minimal set of pages, per wiki, whose behavior changed files can
+        alter: the changed pages and everything importing them, as resolved
+        on each wiki.
+
+        A changed commons page affects every wiki that does not shadow it;
+        a changed wiki page affects only that wiki.
+        """
+        changed: dict[str, set[str]] = defaultdict(set)
+        for path in paths:
+            module = self.module(path)
+            if module is None or module.page is None:
+                continue
+            if module.wiki != COMMONS:
+                changed[module.wiki].add(module.page)
+                continue
+            for wiki in self.wikis:
+                if wiki == COMMONS or module.page not in self.__pages[wiki]:
+                    changed[wiki].add(module.page)
+        return {
+            wiki: self.dependents(wiki, pages)
+            for wiki, pages in sorted(changed.items())
+        }
+
+
+def load_module_graph(use_cache: bool = True) -> ModuleGraph:
+    """Scan every module in lua/wikis into a ModuleGraph.
+
+    Parse results are cached by git blob id, so unmodified files that were
+    scanned before are not read again.
+    """
+    paths = sorted(LUA_WIKIS_DIR.rglob("*.lua"))
+    blob_ids = _tracked_blob_ids()
+    cache = _read_cache() if use_cache else dict()
+    fresh: dict[str, dict] = dict()
+    modules: list[ModuleInfo] = list()
+    for path in paths:
+        entry = cache.get(blob_ids.get(path, ""))
+        if entry is None:
+            data = path.read_bytes()
+            module = parse_module(path, data.decode("utf-8", errors="replace"))
+            blob_id = git_blob_id(data)
+            entry = {"page": module.page, "imports": sorted(module.imports)}
+        else:
+            blob_id = blob_ids[path]
+            module = ModuleInfo(path, entry["page"], frozenset(entry["imports"]))
+        fresh[blob_id] = entry
+        modules.append(module)
+    if use_cache and fresh.keys() != cache.keys():
+        _write_cache(fresh)
+    return ModuleGraph(modules)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="List the pages, per wiki, that changed Lua files can affect"
+    )
+    parser.add_argument(
+        "lua_files", nargs="+", type=pathlib.Path, help="List of changed lua files"
+    )
+    parser.add_argument(
+        "--files",
+        action="store_true",
+        help="Only list the repo files providing the affected pages",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print wiki -> affected pages as JSON"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Parse every file from scratch"
+    )
+    parsed_args = parser.parse_args()
+
+    graph = load_module_graph(not parsed_args.no_cache)
+    affected = graph.affected(parsed_args.lua_files)
+    if parsed_args.files:
+        for path in sorted(
+            {module.path for pages in affected.values() for module in pages.values()}
+        ):
+            print(path)
+    elif parsed_args.json:
+        print(
+            json.dumps(
+                {wiki: list(pages) for wiki, pages in affected.items()}, indent="\t"
+            )
+        )
+    else:
+        for wiki, pages in affected.items():
+            print(f"{wiki}: {len(pages)} pages")
+            for page, module in pages.items():
+                print(f"\t{page} ({module.path})")
+        for path in parsed_args.lua_files:
+            module = graph.module(path)
+            if module is None or module.wiki != COMMONS or module.page is None:
+                continue
+            for override in graph.shadows(module.page):
+                print(f"{override.path} shadows {path}")
+
+
+if __name__ == "__main__":
+    main()
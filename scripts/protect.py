@@ -3,15 +3,66 @@ import os
 import pathlib
 import sys
 
-from deploy_util import get_wikis
+from typing import Optional
+
+from deploy_util import get_wikis, run_concurrently
 from mediawiki_session import MediaWikiSession
 from protect_page import (
     protect_non_existing_pages,
     protect_existing_pages,
     handle_protect_errors,
 )
+from rate_limiter import TokenBucket
 
 WIKI_TO_PROTECT = os.getenv("WIKI_TO_PROTECT")
+PROTECT_JOBS = int(os.getenv("PROTECT_JOBS") or 1)
+REQUEST_BUDGET = 1.0
+
+# wiki -> (pages to edit protect, pages to create protect)
+ProtectPlan = dict[str, tuple[set[str], set[str]]]
+
+
+def protect_wiki(
+    wiki: str,
+    existing_pages: set[str],
+    non_existing_pages: set[str],
+    budget: Optional[TokenBucket] = None,
+):
+    with MediaWikiSession(wiki, budget) as session:
+        if existing_pages:
+            protect_existing_pages(session, existing_pages)
+        if non_existing_pages:
+            protect_non_existing_pages(session, non_existing_pages)
+
+
+def plan_protections(files_to_protect_by_wiki: dict[str, set[str]]) -> ProtectPlan:
+    new_commons_modules = files_to_protect_by_wiki.get("commons")
+    if not new_commons_modules:
+        return {
+            wiki: (new_modules, set())
+            for wiki, new_modules in files_to_protect_by_wiki.items()
+        }
+
+    plan: ProtectPlan = dict()
+    for wiki in sorted(get_wikis()):
+        if wiki == "commons":
+            plan[wiki] = (new_commons_modules, set())
+        else:
+            new_local_modules = files_to_protect_by_wiki.get(wiki) or set()
+            plan[wiki] = (new_local_modules, new_commons_modules - new_local_modules)
+    return plan
+
+
+def execute_plan(plan: ProtectPlan):
+    budget = TokenBucket(REQUEST_BUDGET) if PROTECT_JOBS > 1 else None
+    run_concurrently(
+        protect_wiki,
+        [
+            (wiki, existing_pages, non_existing_pages, budget)
+            for wiki, (existing_pages, non_existing_pages) in plan.items()
+        ],
+        PROTECT_JOBS,
+    )
 
 
 def protect_new_wiki(wiki_to_protect: str):
@@ -64,27 +115,7 @@ def main():
             ]
         )
 
-    new_commons_modules = files_to_protect_by_wiki.get("commons")
-
-    if new_commons_modules:
-        for wiki in sorted(get_wikis()):
-            with MediaWikiSession(wiki) as session:
-                if wiki == "commons":
-                    protect_existing_pages(session, new_commons_modules)
-                else:
-                    new_local_modules = files_to_protect_by_wiki.get(wiki)
-                    if new_local_modules:
-                        protect_existing_pages(session, new_local_modules)
-                        protect_non_existing_pages(
-                            session, new_commons_modules - new_local_modules
-                        )
-                    else:
-                        protect_non_existing_pages(session, new_commons_modules)
-    else:
-        for wiki, new_modules in files_to_protect_by_wiki.items():
-            with MediaWikiSession(wiki) as session:
-                protect_existing_pages(session, new_modules)
-
+    execute_plan(plan_protections(files_to_protect_by_wiki))
     handle_protect_errors()
 
 
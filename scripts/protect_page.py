@@ -54,27 +54,23 @@ def protect_pages(
                 f"::warning::could not ({protect_mode}) protect {page} on {session.wiki}: {str(e)}"
             )
             protect_errors.append(f"{protect_mode}:{session.wiki}:{page}")
-        finally:
-            session.cooldown()
     print("::endgroup::")
 
 
 def protect_non_existing_pages(session: MediaWikiSession, pages: Iterable[str]):
-    def filter_non_existing_pages(page: str) -> bool:
-        try:
-            result = session.make_action(
-                "query",
-                data={"titles": page, "prop": "info"},
-            )
-            if "-1" in result["pages"]:
-                return True
+    pages = list(pages)
+    try:
+        missing_pages = session.get_missing_pages(pages)
+    except MediaWikiSessionError as e:
+        print(f"::warning::could not check pages on {session.wiki}: {str(e)}")
+        protect_errors.extend(f"create:{session.wiki}:{page}" for page in pages)
+        return
+    for page in pages:
+        if page not in missing_pages:
             print(f"::warning::{page} already exists on {session.wiki}")
             protect_errors.append(f"create:{session.wiki}:{page}")
-            return False
-        finally:
-            session.cooldown()
 
-    protect_pages(session, filter(filter_non_existing_pages, pages), "create")
+    protect_pages(session, [page for page in pages if page in missing_pages], "create")
 
 
 def protect_existing_pages(session: MediaWikiSession, pages: Iterable[str]):
@@ -87,7 +83,7 @@ def handle_protect_errors():
     print("::warning::Some pages could not be protected")
     write_to_github_summary_file(":warning: Some pages could not be protected")
     print("::group::Failed protections")
-    for protect_error in protect_errors:
+    for protect_error in sorted(protect_errors):
         print(f"... {protect_error}")
     print("::endgroup::")
     exit(1)
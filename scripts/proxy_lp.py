@@ -1,12 +1,106 @@
 import asyncio
+import gzip
+import hashlib
+import os
+import re
 
 from http import HTTPStatus
+from typing import Callable, NamedTuple, Optional
 
 from mitmproxy import http, master
 from mitmproxy.addons import default_addons, dumper, errorcheck, keepserving, readfile
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+LOCAL_CSS_FILE = "lua/output/css/main.css"
+LOCAL_JS_FILE = "lua/output/js/main.js"
+
+# Fast levels: bodies are compressed on the first request after a rebuild
+ENCODERS: dict[str, Callable[[bytes], bytes]] = {
+    "gzip": lambda body: gzip.compress(body, compresslevel=6),
+}
+if brotli is not None:
+    ENCODERS["br"] = lambda body: brotli.compress(body, quality=4)
+# Preferred first
+ENCODING_PREFERENCE = ("br", "gzip")
+
+ENTITY_TAG_RE = re.compile(r'(?:W/)?("[^"]*")')
+
+
+class CachedAsset(NamedTuple):
+    # Size and modification time of the file the bodies were read from
+    stat: tuple[int, int]
+    etag: str
+    # Content-Encoding -> body, "identity" included; filled as requested
+    bodies: dict[str, bytes]
+
+    def body(self, encoding: str) -> bytes:
+        if encoding not in self.bodies:
+            self.bodies[encoding] = ENCODERS[encoding](self.bodies["identity"])
+        return self.bodies[encoding]
+
+
+class AssetCache:
+    """Local build outputs held in memory, with the encodings served so far.
+
+    Each request only stats the file; it is reread when its size or
+    modification time changed, i.e. after a rebuild, and each encoding is
+    compressed again when first requested. Brotli variants are served when
+    the brotli package is installed.
+    """
+
+    __assets: dict[str, CachedAsset]
+
+    def __init__(self):
+        self.__assets = dict()
+
+    def get(self, path: str) -> CachedAsset:
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        asset = self.__assets.get(path)
+        if asset is None or asset.stat != key:
+            with open(path, "rb") as f:
+                body = f.read()
+            asset = CachedAsset(
+                key, hashlib.sha1(body).hexdigest()[:16], {"identity": body}
+            )
+            self.__assets[path] = asset
+        return asset
+
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    """Content codings an Accept-Encoding header allows (q > 0)."""
+    encodings = set()
+    for coding in accept_encoding.split(","):
+        name, _, parameters = coding.partition(";")
+        quality = 1.0
+        if parameters.strip().startswith("q="):
+            try:
+                quality = float(parameters.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if quality > 0:
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an If-None-Match header matches the ETag, using the weak
+    comparison the header calls for."""
+    if if_none_match.strip() == "*":
+        return True
+    return etag in ENTITY_TAG_RE.findall(if_none_match)
+
 
 class LiquipediaMapper:
+    __asset_cache: AssetCache
+
+    def __init__(self):
+        self.__asset_cache = AssetCache()
+
     def request(self, flow: http.HTTPFlow) -> None:
         if "://liquipedia.net/" not in flow.request.pretty_url:
             return
@@ -23,26 +117,44 @@ class LiquipediaMapper:
             self.__serve_local_js_resource(flow)
 
     def __serve_local_css_resource(self, flow: http.HTTPFlow):
-        with open("lua/output/css/main.css", "rb") as f:
-            flow.response = http.Response.make(
-                HTTPStatus.OK,
-                f.read(),
-                {"Content-Type": "text/css; charset=utf-8"},
-            )
-            flow.response.headers["Via"] = (
-                f"{flow.response.http_version} LiquipediaMapper"
-            )
+        self.__serve_local_resource(flow, LOCAL_CSS_FILE, "text/css; charset=utf-8")
 
     def __serve_local_js_resource(self, flow: http.HTTPFlow):
-        with open("lua/output/js/main.js", "rb") as f:
-            flow.response = http.Response.make(
-                HTTPStatus.OK,
-                f.read(),
-                {"Content-Type": "text/javascript; charset=utf-8"},
-            )
-            flow.response.headers["Via"] = (
-                f"{flow.response.http_version} LiquipediaMapper"
-            )
+        self.__serve_local_resource(
+            flow, LOCAL_JS_FILE, "text/javascript; charset=utf-8"
+        )
+
+    def __serve_local_resource(self, flow: http.HTTPFlow, path: str, content_type: str):
+        asset = self.__asset_cache.get(path)
+        accepted = accepted_encodings(flow.request.headers.get("Accept-Encoding", ""))
+        encoding: Optional[str] = next(
+            (
+                coding
+                for coding in ENCODING_PREFERENCE
+                if coding in accepted and coding in ENCODERS
+            ),
+            None,
+        )
+        etag = f'"{asset.etag}-{encoding}"' if encoding else f'"{asset.etag}"'
+        headers = {
+            "Content-Type": content_type,
+            "Cache-Control": "no-cache",
+            "ETag": etag,
+            "Vary": "Accept-Encoding",
+        }
+
+        if etag_matches(flow.request.headers.get("If-None-Match", ""), etag):
+            flow.response = http.Response.make(HTTPStatus.NOT_MODIFIED, b"", headers)
+        else:
+            if encoding:
+                headers["Content-Encoding"] = encoding
+            # The body is already encoded, so it is set raw rather than through
+            # Response.make, which would encode it again
+            flow.response = http.Response.make(HTTPStatus.OK, b"", headers)
+            body = asset.body(encoding or "identity")
+            flow.response.raw_content = body
+            flow.response.headers["Content-Length"] = str(len(body))
+        flow.response.headers["Via"] = f"{flow.response.http_version} LiquipediaMapper"
 
 
 async def main():
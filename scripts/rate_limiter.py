@@ -0,0 +1,120 @@
+import email.utils
+import threading
+import time
+
+from typing import Optional
+
+__all__ = [
+    "RateLimiter",
+    "TokenBucket",
+    "parse_retry_after",
+]
+
+# Longest pause before a retry, whatever the server asks for
+MAX_BACKOFF = 60
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` tokens per second.
+
+    Callers that find the bucket empty reserve their tokens anyway and sleep
+    off the debt, so concurrent callers are served in arrival order.
+    """
+
+    __capacity: float
+    __lock: threading.Lock
+    __rate: float
+    __tokens: float
+    __updated: float
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        if rate <= 0:
+            raise ValueError(f"invalid rate: {rate}")
+        self.__capacity = capacity
+        self.__lock = threading.Lock()
+        self.__rate = rate
+        self.__tokens = capacity
+        self.__updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self.__rate
+
+    def acquire(self, tokens: float = 1.0):
+        with self.__lock:
+            now = time.monotonic()
+            self.__tokens = min(
+                self.__capacity, self.__tokens + (now - self.__updated) * self.__rate
+            )
+            self.__updated = now
+            self.__tokens -= tokens
+            wait = -self.__tokens / self.__rate
+        if wait > 0:
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """Request pacing for a single API session.
+
+    Reads and writes draw from separate buckets so cheap queries are not held
+    to the edit rate. An optional shared `budget` caps the request rate across
+    all sessions using it. Server-requested pauses (Retry-After, maxlag,
+    HTTP 429/503) block every request of the session until they have passed.
+    """
+
+    __budget: Optional[TokenBucket]
+    __lock: threading.Lock
+    __read_bucket: TokenBucket
+    __resume_at: float
+    __write_bucket: TokenBucket
+
+    def __init__(
+        self,
+        read_rate: float,
+        write_rate: float,
+        budget: Optional[TokenBucket] = None,
+    ):
+        self.__budget = budget
+        self.__lock = threading.Lock()
+        self.__read_bucket = TokenBucket(read_rate)
+        self.__resume_at = 0.0
+        self.__write_bucket = TokenBucket(write_rate)
+
+    def wait(self, write: bool):
+        with self.__lock:
+            pause = self.__resume_at - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+        (self.__write_bucket if write else self.__read_bucket).acquire()
+        if self.__budget is not None:
+            self.__budget.acquire()
+
+    def back_off(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Pause the session before retry number `attempt` (starting at 0).
+
+        Honors the server's Retry-After value when given, otherwise backs off
+        exponentially; either way for at most MAX_BACKOFF seconds. Returns the
+        pause in seconds.
+        """
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            delay = 2 ** (attempt + 1)
+        delay = min(MAX_BACKOFF, delay)
+        with self.__lock:
+            self.__resume_at = max(self.__resume_at, time.monotonic() + delay)
+        return delay
+
+
+def parse_retry_after(retry_after: Optional[str]) -> Optional[float]:
+    """Seconds to wait according to a Retry-After header value, if valid."""
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
@@ -1,26 +1,36 @@
+import asyncio
 import os
 
+from typing import AsyncIterator
+
+from async_mediawiki_session import AsyncMediaWikiSession
 from deploy_util import (
     get_wikis,
     write_to_github_summary_file,
 )
-from mediawiki_session import MediaWikiSession, MediaWikiSessionError
+from mediawiki_session import MediaWikiSessionError
+from rate_limiter import TokenBucket
 
 LUA_DEV_ENV_NAME = os.getenv("LUA_DEV_ENV_NAME")
+INCLUDE_COMMONS = os.getenv("INCLUDE_COMMONS") == "true"
+INCLUDE_SUB_ENVS = os.getenv("INCLUDE_SUB_ENVS") == "true"
+MODULE_NAMESPACE = 828
+REMOVE_JOBS = int(os.getenv("REMOVE_JOBS") or 1)
+REQUEST_BUDGET = 1.0
 
 remove_errors: list[str] = list()
 
 
-def remove_page(session: MediaWikiSession, page: str):
+async def remove_page(session: AsyncMediaWikiSession, page: str):
     print(f"deleting {session.wiki}:{page}")
 
     try:
-        session.make_action(
+        await session.make_action(
             "delete",
             data={
                 "title": page,
                 "reason": f"Remove {LUA_DEV_ENV_NAME}",
-                "token": session.token,
+                "token": await session.token,
             },
         )
     except MediaWikiSessionError:
@@ -29,55 +39,83 @@ def remove_page(session: MediaWikiSession, page: str):
             f":warning: could not delete {page} on {session.wiki}"
         )
         remove_errors.append(f"{session.wiki}:{page}")
+
+
+async def find_dev_pages(session: AsyncMediaWikiSession) -> AsyncIterator[str]:
+    """Lazily yield the titles of the dev environment's modules.
+
+    Exact /dev/<name> pages are found by listing the Module namespace and
+    checking the title suffix, which unlike full-text search is exact and
+    never stale. Sub environments need the intitle search.
+    """
+    if INCLUDE_SUB_ENVS:
+        query = {
+            "list": "search",
+            "srsearch": f"intitle:{LUA_DEV_ENV_NAME}",
+            "srnamespace": MODULE_NAMESPACE,
+            "srlimit": "max",
+            "srprop": "",
+        }
+        list_name = "search"
+    else:
+        query = {
+            "list": "allpages",
+            "apnamespace": MODULE_NAMESPACE,
+            "aplimit": "max",
+        }
+        list_name = "allpages"
+    async for result in session.paginate_query(query):
+        for page in result.get(list_name, []):
+            if INCLUDE_SUB_ENVS or page["title"].endswith(LUA_DEV_ENV_NAME):
+                yield page["title"]
+
+
+async def search_and_remove_on_wiki(session: AsyncMediaWikiSession):
+    """Delete each match as soon as its result page arrives, while the next
+    result page is fetched in the background."""
+    deletes: list[asyncio.Task] = list()
+    try:
+        async for page in find_dev_pages(session):
+            deletes.append(asyncio.create_task(remove_page(session, page)))
+    except MediaWikiSessionError as e:
+        print(f"::warning::search API error on {session.wiki}: {str(e)}")
+        write_to_github_summary_file(
+            f":warning: search API error on {session.wiki}: {str(e)}"
+        )
+    await asyncio.gather(*deletes)
+
+
+async def search_and_remove(wikis: list[str]):
+    """Search and clean up up to REMOVE_JOBS wikis at once.
+
+    Wikis without matches never log in, and deletes on different wikis only
+    wait for each other through the shared request budget.
+    """
+    budget = TokenBucket(REQUEST_BUDGET)
+    global_limit = asyncio.Semaphore(REMOVE_JOBS)
+    sessions = [AsyncMediaWikiSession(wiki, budget, global_limit) for wiki in wikis]
+    try:
+        await asyncio.gather(*map(search_and_remove_on_wiki, sessions))
     finally:
-        session.cooldown()
-
-
-def search_and_remove(wiki: str):
-    with MediaWikiSession(wiki) as session:
-        search_result: dict
-        try:
-            search_result = session.make_action(
-                "query",
-                data={
-                    "list": "search",
-                    "srsearch": f"intitle:{LUA_DEV_ENV_NAME}",
-                    "srnamespace": 828,
-                    "srlimit": 5000,
-                    "srprop": "",
-                },
-            )
-        except MediaWikiSessionError as e:
-            print(f"::warning::search API error on {wiki}: {str(e)}")
-            write_to_github_summary_file(
-                f":warning: search API error on {wiki}: {str(e)}"
-            )
-            return
-        finally:
-            session.cooldown()
-
-        pages = search_result.get("search") or []
-        if len(pages) == 0:
-            return
-
-        for page in pages:
-            if os.getenv("INCLUDE_SUB_ENVS") == "true" or page["title"].endswith(
-                LUA_DEV_ENV_NAME
-            ):
-                remove_page(session, page["title"])
+        await asyncio.gather(*(session.close() for session in sessions))
 
 
 def main():
-    for wiki in sorted(get_wikis()):
-        if wiki == "commons" and os.getenv("INCLUDE_COMMONS") != "true":
-            continue
-        search_and_remove(wiki)
+    asyncio.run(
+        search_and_remove(
+            [
+                wiki
+                for wiki in sorted(get_wikis())
+                if wiki != "commons" or INCLUDE_COMMONS
+            ]
+        )
+    )
     if len(remove_errors) == 0:
         exit(0)
     print("::warning::Could not delete some pages on some wikis")
     write_to_github_summary_file("::warning::Could not delete some pages on some wikis")
     print("::group::Failed protections")
-    for remove_error in remove_errors:
+    for remove_error in sorted(remove_errors):
         print(remove_error)
     print("endgroup")
     exit(1)
@@ -0,0 +1,82 @@
+import email.utils
+import time
+import unittest
+
+from unittest import mock
+
+from rate_limiter import MAX_BACKOFF, RateLimiter, TokenBucket, parse_retry_after
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_rejects_non_positive_rate(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(0)
+
+    def test_full_bucket_does_not_wait(self):
+        bucket = TokenBucket(1.0, capacity=2.0)
+        with mock.patch("rate_limiter.time.sleep") as sleep:
+            bucket.acquire()
+            bucket.acquire()
+        sleep.assert_not_called()
+
+    def test_empty_bucket_sleeps_off_the_debt(self):
+        bucket = TokenBucket(2.0)
+        with mock.patch("rate_limiter.time.sleep") as sleep:
+            bucket.acquire()
+            bucket.acquire()
+        sleep.assert_called_once()
+        self.assertAlmostEqual(sleep.call_args.args[0], 0.5, delta=0.05)
+
+
+class ParseRetryAfterTest(unittest.TestCase):
+    def test_seconds(self):
+        self.assertEqual(parse_retry_after("5"), 5.0)
+
+    def test_negative_seconds(self):
+        self.assertEqual(parse_retry_after("-5"), 0.0)
+
+    def test_http_date(self):
+        retry_at = email.utils.formatdate(time.time() + 30, usegmt=True)
+        self.assertAlmostEqual(parse_retry_after(retry_at), 30, delta=2)
+
+    def test_invalid(self):
+        for value in (None, "", "soon"):
+            with self.subTest(value=value):
+                self.assertIsNone(parse_retry_after(value))
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_exponential_back_off(self):
+        limiter = RateLimiter(10.0, 10.0)
+        self.assertEqual(limiter.back_off(0), 2)
+        self.assertEqual(limiter.back_off(2), 8)
+
+    def test_back_off_is_capped(self):
+        limiter = RateLimiter(10.0, 10.0)
+        self.assertEqual(limiter.back_off(10), MAX_BACKOFF)
+        self.assertEqual(limiter.back_off(0, "3600"), MAX_BACKOFF)
+
+    def test_back_off_honors_retry_after(self):
+        limiter = RateLimiter(10.0, 10.0)
+        self.assertEqual(limiter.back_off(5, "1"), 1.0)
+
+    def test_wait_pauses_after_back_off(self):
+        limiter = RateLimiter(10.0, 10.0)
+        limiter.back_off(0, "1")
+        with mock.patch("rate_limiter.time.sleep") as sleep:
+            limiter.wait(write=False)
+        self.assertAlmostEqual(sleep.call_args_list[0].args[0], 1.0, delta=0.1)
+
+    def test_wait_draws_from_budget(self):
+        budget = TokenBucket(1.0)
+        limiter = RateLimiter(10.0, 10.0, budget)
+        with mock.patch("rate_limiter.time.sleep") as sleep:
+            limiter.wait(write=False)
+            sleep.assert_not_called()
+            limiter.wait(write=True)
+        sleep.assert_called_once()
+        self.assertAlmostEqual(sleep.call_args.args[0], 1.0, delta=0.05)
+
+
+if __name__ == "__main__":
+    unittest.main()